@@ -0,0 +1,291 @@
+# SPDX-License-Identifier: MIT
+#
+# Copyright (c) 2021 The Anvil Extras project team members listed at
+# https://github.com/anvilistas/anvil-extras/graphs/contributors
+#
+# This software is published at https://github.com/anvilistas/anvil-extras
+
+"""in-process stand-ins for the parts of anvil that routing uses
+
+install() puts anvil, anvil.js, anvil.js.window and anvil.http into sys.modules
+so that routing can be imported and exercised under plain CPython
+timers are queued rather than run - call run_timers() to run them
+"""
+
+import sys
+import types
+from urllib.parse import quote, unquote
+
+_timers = []
+_open_form = [None]
+_window_listeners = {}
+_window_lookups = []  # attributes looked up on the window since the last reset()
+
+
+# anvil.http
+def url_encode(s):
+    return quote(str(s), safe="")
+
+
+def url_decode(s):
+    return unquote(s)
+
+
+# anvil.js.window
+class Window(types.ModuleType):
+    """records attribute lookups - in the browser each one is a js proxy lookup"""
+
+    def __getattribute__(self, name):
+        if not name.startswith("__") and name != "window":
+            _window_lookups.append(name)
+        return types.ModuleType.__getattribute__(self, name)
+
+
+def window_lookups():
+    return list(_window_lookups)
+
+
+class Location:
+    def __init__(self):
+        self.hash = ""
+
+    def reload(self):
+        pass
+
+
+class History:
+    def __init__(self, window):
+        self._window = window
+        self.state = None
+        self.length = 1
+
+    def _set_hash(self, url):
+        if url is not None:
+            self._window.location.hash = url if url.startswith("#") else "#" + url
+
+    def pushState(self, state, title, url=None):
+        self.state = state
+        self.length += 1
+        self._set_hash(url)
+
+    def replaceState(self, state, title, url=None):
+        self.state = state
+        self._set_hash(url)
+
+    def back(self):
+        pass
+
+    def go(self, x=0):
+        pass
+
+
+class Document:
+    title = "HashRouting"
+
+
+class _Storage:
+    def __init__(self):
+        self._items = {}
+
+    def getItem(self, key):
+        return self._items.get(key)
+
+    def setItem(self, key, value):
+        self._items[key] = str(value)
+
+    def removeItem(self, key):
+        self._items.pop(key, None)
+
+
+class JQuery:
+    def __init__(self, selector=None):
+        self.selector = selector
+
+    def __iter__(self):
+        return iter(())  # no modals in a headless run
+
+    def on(self, *args):
+        return self
+
+    def data(self, key):
+        return None
+
+    def modal(self, *args):
+        return self
+
+
+class Set(set):
+    def delete(self, item):
+        self.discard(item)
+
+    @property
+    def size(self):
+        return len(self)
+
+
+class Promise:
+    def __init__(self, executor):
+        executor(lambda value=None: None, lambda error=None: None)
+
+
+def add_event_listener(event, handler):
+    _window_listeners.setdefault(event, []).append(handler)
+
+
+def dispatch_window_event(event):
+    """e.g. dispatch_window_event("pagehide") before simulating a reload"""
+    for handler in list(_window_listeners.get(event, ())):
+        handler(None)
+
+
+def set_timeout(fn, delay=0):
+    _timers.append(fn)
+    return len(_timers)
+
+
+def clear_timeout(timer_id):
+    if timer_id and timer_id <= len(_timers):
+        _timers[timer_id - 1] = None
+
+
+def run_timers():
+    """run queued timers (and any timers they queue)"""
+    while _timers:
+        fn = _timers.pop(0)
+        if fn is not None:
+            fn()
+
+
+# anvil.js
+class DomNode:
+    def __init__(self):
+        self.listeners = {}
+
+    def addEventListener(self, event, handler):
+        self.listeners.setdefault(event, []).append(handler)
+
+
+def get_dom_node(component):
+    node = getattr(component, "_dom_node", None)
+    if node is None:
+        node = component._dom_node = DomNode()
+    return node
+
+
+def await_promise(promise):
+    return None
+
+
+# anvil
+class Component:
+    def __init__(self, **properties):
+        self.parent = None
+        self.visible = True
+        self._event_handlers = {}
+
+    def remove_from_parent(self):
+        if self.parent is not None:
+            self.parent._components.remove(self)
+            self.parent = None
+
+    def get_event_handlers(self, event):
+        return list(self._event_handlers.get(event, ()))
+
+    def set_event_handler(self, event, handler):
+        self._event_handlers[event] = [handler]
+
+    def add_event_handler(self, event, handler):
+        self._event_handlers.setdefault(event, []).append(handler)
+
+    def remove_event_handler(self, event, handler):
+        self._event_handlers[event].remove(handler)
+
+    def raise_event(self, event, **event_args):
+        for handler in list(self._event_handlers.get(event, ())):
+            handler(sender=self, event_name=event, **event_args)
+
+
+class ColumnPanel(Component):
+    def __init__(self, **properties):
+        super().__init__(**properties)
+        self._components = []
+
+    def clear(self):
+        for component in self._components:
+            component.parent = None
+        self._components = []
+
+    def add_component(self, component, **layout_props):
+        component.parent = self
+        self._components.append(component)
+
+    def get_components(self):
+        return list(self._components)
+
+
+class Form(Component):
+    """a template form - it has a content_panel like an anvil template"""
+
+    def __init__(self, **properties):
+        super().__init__(**properties)
+        self.content_panel = ColumnPanel()
+
+
+def get_open_form():
+    return _open_form[0]
+
+
+def open_form(form):
+    _open_form[0] = form
+    form.raise_event("show")
+
+
+def reset():
+    """a fresh browser - no open form, no queued timers, an empty url"""
+    _open_form[0] = None
+    _timers.clear()
+    _window_listeners.clear()
+    window = sys.modules["anvil.js.window"]
+    window.location = Location()
+    window.history = History(window)
+    window.document = Document()
+    window.sessionStorage = _Storage()
+    _window_lookups.clear()
+
+
+def install():
+    anvil = types.ModuleType("anvil")
+    js = types.ModuleType("anvil.js")
+    window = Window("anvil.js.window")
+    http = types.ModuleType("anvil.http")
+
+    http.url_encode = url_encode
+    http.url_decode = url_decode
+
+    window.window = window
+    window.jQuery = JQuery
+    window.Set = Set
+    window.Promise = Promise
+    window.setTimeout = set_timeout
+    window.clearTimeout = clear_timeout
+    window.requestAnimationFrame = set_timeout
+    window.onpopstate = None
+    window.onbeforeunload = None
+    window.addEventListener = add_event_listener
+
+    js.window = window
+    js.get_dom_node = get_dom_node
+    js.await_promise = await_promise
+
+    anvil.js = js
+    anvil.http = http
+    anvil.Component = Component
+    anvil.ColumnPanel = ColumnPanel
+    anvil.Form = Form
+    anvil.get_open_form = get_open_form
+    anvil.open_form = open_form
+
+    sys.modules.update(
+        {"anvil": anvil, "anvil.js": js, "anvil.js.window": window, "anvil.http": http}
+    )
+    reset()
@@ -0,0 +1,368 @@
+# SPDX-License-Identifier: MIT
+#
+# Copyright (c) 2021 The Anvil Extras project team members listed at
+# https://github.com/anvilistas/anvil-extras/graphs/contributors
+#
+# This software is published at https://github.com/anvilistas/anvil-extras
+
+"""headless benchmarks for the routing engine
+
+    python benchmarks/bench_routing.py [--sizes 10 100 1000 10000] [--output results.jsonl]
+
+each result is written to stdout (and --output) as a line of json:
+{"scenario": str, "variant": str, "size": int, "ops": int, "seconds": float, "us_per_op": float}
+size is the number of registered routes (or redirects) and cached forms
+the import scenario also records budget_ms and within_budget - the run exits non-zero
+if a budget is exceeded or importing routing touched the browser
+"""
+
+import argparse
+import importlib
+import importlib.util
+import json
+import os
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, HERE)
+
+import anvil_stubs  # noqa: E402
+
+anvil_stubs.install()
+
+# navigations and lookups per measurement - keeps the linear scan at 10k routes sane
+MAX_SAMPLE = 500
+CHAIN_LENGTH = 5
+IMPORT_REPEATS = 20
+IMPORT_BUDGET_MS = 50  # per fresh import of HashRouting.routing under CPython
+
+
+def load_routing():
+    """a fresh import of HashRouting.routing - registrations live in module globals"""
+    for name in [n for n in sys.modules if n.split(".")[0] == "HashRouting"]:
+        del sys.modules[name]
+    anvil_stubs.reset()
+    spec = importlib.util.spec_from_file_location(
+        "HashRouting",
+        os.path.join(ROOT, "__init__.py"),
+        submodule_search_locations=[ROOT],
+    )
+    package = importlib.util.module_from_spec(spec)
+    sys.modules["HashRouting"] = package
+    spec.loader.exec_module(package)
+    return importlib.import_module("HashRouting.routing")
+
+
+def result(scenario, variant, size, ops, seconds, **extra):
+    return {
+        "scenario": scenario,
+        "variant": variant,
+        "size": size,
+        "ops": ops,
+        "seconds": seconds,
+        "us_per_op": seconds / ops * 1e6 if ops else None,
+        **extra,
+    }
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+def sample(items):
+    return items[:: max(1, len(items) // MAX_SAMPLE)]
+
+
+def make_route_classes(size):
+    return [type(f"Page{i}", (anvil_stubs.Component,), {}) for i in range(size)]
+
+
+def route_url(i):
+    # a mix of static, dynamic and query string routes
+    if i % 3 == 0:
+        return f"page{i}", {}
+    elif i % 3 == 1:
+        return f"page{i}/{i}", {}
+    return f"page{i}", {"id": str(i)}
+
+
+def register_routes(routing, classes):
+    for i, cls in enumerate(classes):
+        if i % 3 == 0:
+            routing.route(f"page{i}")(cls)
+        elif i % 3 == 1:
+            routing.route(f"page{i}/{{id}}", title=f"Page {{id}}")(cls)
+        else:
+            routing.route(f"page{i}", url_keys=["id"], title=f"Page {{id}}")(cls)
+
+
+def launch(routing):
+    @routing.template()
+    class Main(anvil_stubs.Form):
+        pass
+
+    routing.route("")(type("Home", (anvil_stubs.Component,), {}))
+
+    anvil_stubs.open_form(Main())
+    anvil_stubs.run_timers()
+    return Main
+
+
+def hashes_for(routing, size):
+    from HashRouting.routing._utils import _get_url_hash
+
+    return [_get_url_hash(*route_url(i)) for i in range(size)]
+
+
+def browser_side_effects():
+    """what importing routing must not have touched"""
+    window = sys.modules["anvil.js.window"]
+    # js proxy lookups are deferred to the first navigation too
+    touched = [f"window.{name}" for name in dict.fromkeys(anvil_stubs.window_lookups())]
+    if window.onpopstate is not None:
+        touched.append("onpopstate")
+    if window.history.state is not None:
+        touched.append("history.state")
+    return touched
+
+
+def bench_import(size):
+    """the cost of a fresh import - size is ignored"""
+    seconds = 0
+    for _ in range(IMPORT_REPEATS):
+        seconds += timed(load_routing)
+        touched = browser_side_effects()
+        if touched:
+            raise AssertionError(f"importing routing touched: {', '.join(touched)}")
+    ms = seconds / IMPORT_REPEATS * 1e3
+    yield result(
+        "import",
+        "routing",
+        0,
+        IMPORT_REPEATS,
+        seconds,
+        budget_ms=IMPORT_BUDGET_MS,
+        within_budget=ms <= IMPORT_BUDGET_MS,
+    )
+
+
+bench_import.sized = False
+
+
+def bench_registration(size):
+    routing = load_routing()
+    classes = make_route_classes(size)
+    seconds = timed(register_routes, routing, classes)
+    yield result("registration", "routes", size, size, seconds)
+    manifest = json.loads(json.dumps(routing.get_route_manifest()))
+
+    routing = load_routing()
+    seconds = timed(routing.load_route_manifest, manifest)
+    yield result("registration", "manifest", size, size, seconds)
+
+    routing = load_routing()
+
+    def register_redirects():
+        for i in range(size):
+            routing.redirect(f"old{i}", condition=lambda: False)(lambda: "")
+
+    yield result("registration", "redirects", size, size, timed(register_redirects))
+
+
+def bench_url_components(size):
+    routing = load_routing()
+    hashes = [f"page{i}/{i}?id={i}&q=some%20text&tab=details" for i in range(size)]
+    routing.set_url_cache_size(size)
+
+    def parse_all():
+        for url_hash in hashes:
+            routing.get_url_components(url_hash)
+
+    yield result("get_url_components", "cold", size, size, timed(parse_all))
+    yield result("get_url_components", "warm", size, size, timed(parse_all))
+    routing.set_url_cache_size(0)
+    yield result("get_url_components", "uncached", size, size, timed(parse_all))
+
+
+def bench_path_matcher(size):
+    routing = load_routing()
+    register_routes(routing, make_route_classes(size))
+    Main = launch(routing)
+    from HashRouting.routing import _router
+
+    template_info = next(iter(_router._ordered_info.values()))[0]
+    assert template_info.form is Main
+    hashes = sample(hashes_for(routing, size))
+    components = [routing.get_url_components(url_hash) for url_hash in hashes]
+    ops = len(components)
+
+    def match_all():
+        for url_hash, url_pattern, url_dict in components:
+            _router.path_matcher(template_info, "", url_hash, url_pattern, url_dict)
+
+    yield result("path_matcher", "linear", size, ops, timed(match_all))
+    routing.use_compiled_matcher()
+    # the first pass includes building the trie
+    yield result("path_matcher", "compiled_build", size, ops, timed(match_all))
+    yield result("path_matcher", "compiled", size, ops, timed(match_all))
+
+
+def bench_template_resolution(size):
+    routing = load_routing()
+    for i in range(size):
+        routing.redirect(f"old{i}/", condition=lambda: False)(lambda: "")
+    launch(routing)
+    from HashRouting.routing import _router
+
+    patterns = sample([f"old{i}/x" for i in range(size)])
+    misses = ["page"] * len(patterns)
+    ops = len(patterns)
+
+    def resolve(patterns):
+        for url_pattern in patterns:
+            _router.load_template_or_redirect(url_pattern)
+
+    seconds = timed(resolve, patterns)
+    yield result("template_resolution", "redirect_prefix", size, ops, seconds)
+    seconds = timed(resolve, misses)
+    yield result("template_resolution", "no_redirect", size, ops, seconds)
+
+
+def bench_navigate(size):
+    for variant, compiled in (("linear", False), ("compiled", True)):
+        routing = load_routing()
+        register_routes(routing, make_route_classes(size))
+        routing.use_compiled_matcher(compiled)
+        launch(routing)
+        hashes = sample(hashes_for(routing, size))
+
+        def navigate_all():
+            for url_hash in hashes:
+                routing.set_url_hash(url_hash)
+
+        ops = len(hashes)
+        yield result("navigate", f"cold_{variant}", size, ops, timed(navigate_all))
+        yield result("navigate", f"warm_{variant}", size, ops, timed(navigate_all))
+
+
+def bench_url_for(size):
+    routing = load_routing()
+    classes = make_route_classes(size)
+    register_routes(routing, classes)
+    launch(routing)
+    picked = sample(list(enumerate(classes)))
+    ops = len(picked)
+
+    def url_for(i, cls):
+        url_pattern, url_dict = route_url(i)
+        values = dict(url_dict, id=str(i)) if i % 3 == 1 else url_dict
+        return routing.url_for(cls, **values)
+
+    def build_urls():
+        for i, cls in picked:
+            url_for(i, cls)
+
+    # the first pass includes building the formatters
+    yield result("url_for", "build_first", size, ops, timed(build_urls))
+    yield result("url_for", "build", size, ops, timed(build_urls))
+
+    def navigate_all():
+        for i, cls in picked:
+            routing.set_url_hash(url_for(i, cls))
+
+    yield result("url_for", "navigate_cold", size, ops, timed(navigate_all))
+
+
+def bench_invalidate(size):
+    routing = load_routing()
+    launch(routing)
+    Record = type("Record", (anvil_stubs.Component,), {})
+    hashes = [f"record/{i}" for i in range(size)]
+
+    def fill_cache():
+        for i, url_hash in enumerate(hashes):
+            form = Record()
+            form.cache_tags = [f"record:{i}", f"group:{i % 10}"]
+            routing.add_to_cache(url_hash, form)
+
+    yield result("invalidate", "fill", size, size, timed(fill_cache))
+    picked = sample(list(range(size)))
+
+    def invalidate_each():
+        for i in picked:
+            routing.invalidate(tag=f"record:{i}")
+
+    # should not grow with the size of the cache
+    yield result("invalidate", "tag_one", size, len(picked), timed(invalidate_each))
+    remaining = len(routing.get_cache())
+    seconds = timed(lambda: routing.invalidate(form=Record))
+    yield result("invalidate", "form_all", size, remaining, seconds)
+
+
+def bench_redirect_chain(size):
+    routing = load_routing()
+    register_routes(routing, make_route_classes(size))
+    for i in range(CHAIN_LENGTH):
+        target = f"chain{i + 1}" if i + 1 < CHAIN_LENGTH else "page0"
+        redirect = routing.redirect(f"chain{i}", priority=1, condition=lambda: True)
+        redirect(lambda target=target: target)
+    launch(routing)
+    ops = min(size, MAX_SAMPLE)
+
+    def follow_chain():
+        for _ in range(ops):
+            routing.set_url_hash("chain0")
+            routing.set_url_hash("")
+
+    seconds = timed(follow_chain)
+    yield result("redirect_chain", f"length_{CHAIN_LENGTH}", size, ops, seconds)
+
+
+SCENARIOS = [
+    bench_import,
+    bench_registration,
+    bench_url_components,
+    bench_path_matcher,
+    bench_template_resolution,
+    bench_navigate,
+    bench_url_for,
+    bench_invalidate,
+    bench_redirect_chain,
+]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sizes = [10, 100, 1000, 10000]
+    parser.add_argument("--sizes", type=int, nargs="+", default=sizes)
+    parser.add_argument("--output", help="also write the json lines to this file")
+    parser.add_argument("--only", nargs="+", help="scenario names to run e.g. navigate")
+    args = parser.parse_args(argv)
+
+    out = open(args.output, "w") if args.output else None
+    over_budget = False
+    try:
+        for scenario in SCENARIOS:
+            name = scenario.__name__[len("bench_") :]
+            if args.only and name not in args.only:
+                continue
+            for size in args.sizes if getattr(scenario, "sized", True) else [0]:
+                for record in scenario(size):
+                    over_budget = over_budget or record.get("within_budget") is False
+                    line = json.dumps(record)
+                    print(line, flush=True)
+                    if out is not None:
+                        out.write(line + "\n")
+    finally:
+        if out is not None:
+            out.close()
+    if over_budget:
+        sys.exit("over budget - see the records with within_budget=false")
+
+
+if __name__ == "__main__":
+    main()
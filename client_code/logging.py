@@ -5,6 +5,7 @@
 #
 # This software is published at https://github.com/anvilistas/anvil-extras
 
+import re
 import sys
 from datetime import datetime as _datetime
 from functools import wraps
@@ -33,6 +34,65 @@ def _get_level_name(level):
     return _level_to_name.get(level) or f"Level {level}"
 
 
+def _get_format_fields(format):
+    # the replacement field names used by the format string - ignoring escaped braces
+    return frozenset(re.findall(r"{(\w+)", format.replace("{{", "")))
+
+
+class Lazy:
+    """a message that is only built if it will be output
+    e.g. logger.debug(Lazy(lambda: expensive()))
+    """
+
+    __slots__ = ("fn",)
+
+    def __init__(self, fn):
+        self.fn = fn
+
+    def __repr__(self):
+        return f"Lazy({self.fn!r})"
+
+
+class RingBuffer:
+    """a fixed size in-memory sink for log messages - once full the oldest are overwritten
+    raw = False - messages are formatted when they are logged
+        = True - (created, level, msg, args) records are kept and only formatted when dumped
+                 this is cheaper but args are formatted with their values at the time of the dump
+    """
+
+    def __init__(self, max_size=500, raw=False):
+        if not isinstance(max_size, int) or max_size < 1:
+            raise TypeError("max_size must be an int greater than 0")
+        self.max_size = max_size
+        self.raw = raw
+        self.clear()
+
+    def append(self, record):
+        self._records[self._next] = record
+        self._next = (self._next + 1) % self.max_size
+        if self._count < self.max_size:
+            self._count += 1
+
+    def dump(self):
+        """the buffered records - oldest first"""
+        start = (self._next - self._count) % self.max_size
+        end = start + self._count
+        if end <= self.max_size:
+            return self._records[start:end]
+        return self._records[start:] + self._records[: end - self.max_size]
+
+    def clear(self):
+        self._records = [None] * self.max_size
+        self._next = 0
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__} ({self._count}/{self.max_size})>"
+
+
 class Logger:
     def __init__(
         self,
@@ -40,13 +100,32 @@ class Logger:
         level=NOTSET,
         format="{name}: {level}: {msg}",
         stream=None,
+        ring=None,
+        ring_level=None,
     ):
+        """ring       = a RingBuffer - messages are also kept in memory, see dump_ring() and flush_ring()
+        ring_level = the level for the ring, None uses level
+                     e.g. level=WARNING, ring_level=DEBUG keeps a debug trail without writing it to the stream
+        """
         self._validate(level, format, stream)
+        self._validate_ring(ring, ring_level)
         self.name = name
         self.stream = stream or sys.stdout
         self.level = level
         self.format = format
         self.disabled = False
+        self.ring = ring
+        self.ring_level = ring_level
+
+    @property
+    def format(self):
+        return self._format
+
+    @format.setter
+    def format(self, format):
+        self._format = format
+        # parse once so that we only compute the params the format uses
+        self._fields = _get_format_fields(format)
 
     def _validate(self, level, format, stream):
         if level not in _level_to_name:
@@ -58,48 +137,115 @@ class Logger:
         ):
             raise TypeError("a valid stream must have a .write() and .flush() method")
 
+    def _validate_ring(self, ring, ring_level):
+        if ring is not None and not (hasattr(ring, "append") and hasattr(ring, "dump")):
+            raise TypeError("a valid ring must have an .append() and .dump() method")
+        if ring_level is not None and ring_level not in _level_to_name:
+            raise TypeError("ring_level should be None or a valid logging level")
+
     def _write(self, msg):
         self.stream.write(msg + "\n")
         self.stream.flush()
 
-    def get_format_params(self, *, level, msg, **params):
-        now = _datetime.now()
+    def get_format_params(self, *, level, msg, now=None, **params):
+        fields = self._fields
+        if "time" in fields or "datetime" in fields:
+            now = now or _datetime.now()
+            params["time"] = now.time()
+            params["datetime"] = now
         return {
             "name": self.name,
-            "time": now.time(),
-            "datetime": now,
             "level": _get_level_name(level),
             "msg": msg,
             **params,
         }
 
-    def log(self, level, msg):
-        """log a message at a given level"""
-        if level < self.level or self.disabled:
-            return
-        params = self.get_format_params(level=level, msg=msg)
-        out = self.format.format(**params)
-        self._write(out)
+    def _ring_level(self):
+        ring_level = self.ring_level
+        return self.level if ring_level is None else ring_level
 
-    def debug(self, msg):
+    def is_enabled_for(self, level):
+        """whether a message at this level would be output - use this to guard expensive messages"""
+        if self.disabled:
+            return False
+        return level >= self.level or (
+            self.ring is not None and level >= self._ring_level()
+        )
+
+    def _format_msg(self, level, msg, args, now=None):
+        if type(msg) is Lazy:
+            msg = msg.fn()
+        if args:
+            msg = msg % args
+        params = self.get_format_params(level=level, msg=msg, now=now)
+        return self._format.format(**params)
+
+    def log(self, level, msg, *args):
+        """log a message at a given level
+        the msg is only formatted if it will be output:
+        msg can be a %-style format string with args e.g. logger.debug("loaded %r", form)
+        or a Lazy that builds the message e.g. logger.debug(Lazy(lambda: expensive()))
+        any other msg is output as it is e.g. logger.info(obj) outputs str(obj)
+        """
+        if self.disabled:
+            return
+        ring = self.ring
+        to_ring = ring is not None and level >= self._ring_level()
+        to_stream = level >= self.level
+        if not (to_ring or to_stream):
+            return
+        if to_ring and ring.raw:
+            ring.append((_time(), level, msg, args))
+            if not to_stream:
+                return
+        out = self._format_msg(level, msg, args)
+        if to_ring and not ring.raw:
+            ring.append(out)
+        if to_stream:
+            self._write(out)
+
+    def dump_ring(self):
+        """the messages in the ring buffer as formatted strings - oldest first"""
+        if self.ring is None:
+            return []
+        if not self.ring.raw:
+            return self.ring.dump()
+        return [
+            self._format_msg(level, msg, args, _datetime.fromtimestamp(created))
+            for created, level, msg, args in self.ring.dump()
+        ]
+
+    def flush_ring(self, stream=None):
+        """write the ring buffer to the stream (or this logger's stream) and empty it
+        e.g. call logger.flush_ring() from an error handler to see what led to the error
+        """
+        stream = stream or self.stream
+        lines = self.dump_ring()
+        if lines:
+            stream.write("\n".join(lines) + "\n")
+            stream.flush()
+        if self.ring is not None:
+            self.ring.clear()
+
+    def debug(self, msg, *args):
         """outputs the msg only if the level is set to logging.DEBUG"""
-        self.log(DEBUG, msg)
+        self.log(DEBUG, msg, *args)
 
-    def info(self, msg):
+    def info(self, msg, *args):
         """outputs the msg only if the level is set to logging.INFO or logging.DEBUG"""
-        self.log(INFO, msg)
+        self.log(INFO, msg, *args)
 
-    def warning(self, msg):
+    def warning(self, msg, *args):
         """outputs the msg only if the level is set to logging.INFO, logging.DEBUG or logging.WARNING"""
-        self.log(WARNING, msg)
+        self.log(WARNING, msg, *args)
 
-    def error(self, msg):
+    def error(self, msg, *args):
         """outputs the msg only if the level is set to logging.ERROR or below"""
-        self.log(ERROR, msg)
+        self.log(ERROR, msg, *args)
 
-    def critical(self, msg):
+    def critical(self, msg, *args):
         """always outputs a message"""
-        self.log(WARNING, msg)
+        self.log(WARNING, msg, *args)
 
     def __repr__(self):
         return (
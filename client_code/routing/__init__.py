@@ -9,12 +9,24 @@ __version__ = "2.1.0"
 
 from anvil.js import window as _w
 
-from . import _navigation
+from . import (
+    _coalesce,
+    _conditions,
+    _loader,
+    _manifest,
+    _navigation,
+    _prefetch,
+    _snapshots,
+)
 from . import _router as _r
+from . import _timing
 from ._decorators import error_form, redirect, route, template
 from ._logging import logger
 from ._router import NavigationExit, launch
+from ._snapshots import MemoryStorage
 from ._utils import (
+    _cache_url_hash,
+    _parse_cache,
     _process_url_arguments,
     get_url_components,
     get_url_dict,
@@ -26,6 +38,13 @@ default_template = template()
 main_router = default_template  # backwards compatability
 
 
+def init():
+    """install the popstate handler, take over the history state and read the default title
+    this happens on the first launch or navigation - call init() if you need it to happen sooner
+    """
+    _r.init()
+
+
 #### some helpers #####
 def reload_page(hard=False):
     """reload the current page"""
@@ -82,11 +101,11 @@ def remove_from_cache(url_hash=None, *, url_pattern=None, url_dict=None):
     url_hash = _process_url_arguments(
         url_hash, url_pattern=url_pattern, url_dict=url_dict
     )[0]
-    logger.debug(f"removing {url_hash!r} from cache")
-    cached = _r._cache.pop(url_hash, None)
+    logger.debug("removing %r from cache", url_hash)
+    cached = _r._cache.remove(url_hash)
     if cached is None:
-        msg = f"*warning* {url_hash!r} was not found in cache - maybe the form was yet to load"
-        logger.debug(msg)
+        msg = "*warning* %r was not found in cache - maybe the form was yet to load"
+        logger.debug(msg, url_hash)
 
 
 def get_cache():
@@ -97,19 +116,330 @@ def add_to_cache(url_hash, form):
     """the form should be initiated
     useful if you have a form instance and want to add it to cache without navigating to it
     """
-    logger.debug(f"adding {url_hash!r} to cache with {form.__class__.__name__!r}")
+    logger.debug("adding %r to cache with %r", url_hash, type(form).__name__)
     _r._cache[url_hash] = form
 
 
 def clear_cache():
     logger.debug("clearing the cache")
-    _r._cache.clear()
+    _r._cache.remove_all()
+
+
+def invalidate(*, pattern=None, form=None, template=None, tag=None):
+    """remove the cached forms matching every given argument - returns the number removed
+    pattern  = the route's url_pattern e.g. "article/{id}" or the url_pattern of the form e.g. "article/42"
+    form     = the form class e.g. ArticleForm (not its subclasses)
+    template = the template name the form was cached with e.g. "MainTemplate"
+    tag      = a tag from the form's cache_tags attribute e.g. self.cache_tags = ["article:42"]
+    only the matching entries are visited so this is cheap with a large cache
+    """
+    for name, value in (("pattern", pattern), ("template", template), ("tag", tag)):
+        if not (value is None or isinstance(value, str)):
+            raise TypeError(f"{name} must be type str or None not {type(value)}")
+    if not (form is None or isinstance(form, type)):
+        raise TypeError(f"form must be a form class or None not {type(form)}")
+    if pattern is None and form is None and template is None and tag is None:
+        raise TypeError("invalidate() needs one of pattern, form, template or tag")
+    count = _r._cache.invalidate(
+        url_pattern=pattern, form=form, template=template, tag=tag
+    )
+    logger.debug(
+        "invalidated %r cached forms (pattern=%r, form=%r, template=%r, tag=%r)",
+        count,
+        pattern,
+        getattr(form, "__name__", None),
+        template,
+        tag,
+    )
+    return count
+
+
+def update_cache_tags(form):
+    """call after changing the cache_tags of a form that is already in the cache"""
+    _r._cache.update_tags(form)
+
+
+def set_keep_alive(max_mounted=5):
+    """keep recently used cached forms mounted but hidden in the content_panel
+    switching to a mounted form only changes its visibility rather than re-adding it
+    the visible form stays on screen until the next form is ready
+    max_mounted         = int - the most forms to keep mounted, 0 disables keep alive mode
+    """
+    if not isinstance(max_mounted, int):
+        raise TypeError(f"max_mounted must be type int not {type(max_mounted)}")
+    logger.debug("setting keep alive: max_mounted=%r", max_mounted)
+    _r.set_keep_alive(max_mounted)
+
+
+def get_cache_stats():
+    """returns a snapshot of the cache counters since the last reset_cache_stats()
+    counters are totals and are broken down by form class name (by_form)
+    and by template name (by_template)
+    """
+    return _r._cache_stats.snapshot(_r._cache)
+
+
+def reset_cache_stats():
+    logger.debug("resetting the cache stats")
+    _r._cache_stats.reset()
+
+
+def set_cache_history_window(positions=None):
+    """keep cached forms for the url_hashes within this many back/forward positions of the current page
+    forms whose url_hash has left the window (or was replaced with replace_current_url=True) are evicted
+    forms that were never in the history e.g. prefetched forms are only evicted by set_cache_limit()
+    positions = None - no history window (the default)
+    """
+    if not (positions is None or isinstance(positions, int)):
+        raise TypeError(f"positions must be type int or None not {type(positions)}")
+    logger.debug("setting the cache history window to: %r", positions)
+    _r.set_history_window(positions)
+
+
+def set_cache_limit(max_size=None):
+    """limit the number of forms kept in the cache - the least recently used are evicted first
+    max_size            = None - the cache is unbounded (the default behaviour)
+    the current form is never evicted
+    forms with an on_evict method will have it called when they are evicted
+    """
+    if not (max_size is None or isinstance(max_size, int)):
+        raise TypeError(f"max_size must be type int or None not {type(max_size)}")
+    logger.debug(f"setting the cache limit to: {max_size!r}")
+    _r._cache.set_max_size(max_size)
+
+
+def set_canonical_urls(enabled=True):
+    """cache forms against a canonical url_hash so equivalent url_hashes share one form
+    e.g. "item?a=1&b=2", "item?b=2&a=1", "item?b=%32&a=1" are all cached as "item?a=1&b=2"
+    only the query is normalized - url_patterns that differ (e.g. a trailing "/") route differently
+    the address bar and form.url_hash keep the url_hash exactly as it was given
+    call this before the first navigation - changing it clears the cache
+    """
+    logger.debug("canonical urls: enabled=%r", enabled)
+    _r.set_canonical_urls(bool(enabled))
 
 
 def load_error_form():
     return _r.load_error_form()
 
 
+def clear_route_data(form=None):
+    """clear cached loader results - for a single routed form class or all of them"""
+    logger.debug("clearing route data for: %r", form)
+    _loader.data_cache.invalidate(form)
+
+
+def set_route_data_cache_size(max_size=50):
+    """the number of loader results to keep - the least recently used are dropped first"""
+    if not isinstance(max_size, int):
+        raise TypeError(f"max_size must be type int not {type(max_size)}")
+    if max_size < 0:
+        raise ValueError(f"max_size must not be negative, got {max_size!r}")
+    _loader.data_cache.set_max_size(max_size)
+
+
+def set_route_snapshots(
+    enabled=True,
+    *,
+    storage=None,
+    max_entries=20,
+    max_size=100000,
+    ttl=3600,
+    version=None,
+):
+    """keep a small snapshot of each route form's state in sessionStorage so that a form can
+    render without refetching after a hard reload
+    a form opts in by defining get_snapshot() which returns a json serializable value (or None)
+    it is called when the form is navigated away from and when the page is hidden
+    the next time a form is created for that url_hash the value is available as self.route_snapshot
+    before __init__ is called - a snapshot is used at most once
+
+    storage     = None - window.sessionStorage
+                = an object with getItem/setItem/removeItem e.g. routing.MemoryStorage() in tests
+    max_entries = the number of url_hashes with a snapshot - the oldest are dropped first
+    max_size    = the number of characters of json kept in storage
+    ttl         = seconds - older snapshots are discarded, None never expires
+    version     = snapshots saved with another version are discarded e.g. your app's version
+                  a form can also set a snapshot_version class attribute
+    """
+    if not (isinstance(max_entries, int) and isinstance(max_size, int)):
+        raise TypeError("max_entries and max_size must be type int")
+    if not (ttl is None or isinstance(ttl, (int, float))):
+        raise TypeError(f"ttl must be a number of seconds or None not {type(ttl)}")
+    if storage is not None and not all(
+        hasattr(storage, method) for method in ("getItem", "setItem", "removeItem")
+    ):
+        raise TypeError("storage must have getItem, setItem and removeItem methods")
+    logger.debug("route snapshots: enabled=%r", enabled)
+    _snapshots.enabled = enabled
+    _snapshots.storage = storage
+    _snapshots.max_entries = max_entries
+    _snapshots.max_size = max_size
+    _snapshots.ttl = ttl
+    _snapshots.version = version
+    _snapshots.reset()
+    if enabled:
+        _snapshots.listen()
+
+
+def clear_route_snapshots():
+    """remove every saved snapshot e.g. on logout"""
+    _snapshots.clear()
+
+
+def prefetch(url_hash=None, *, url_pattern=None, url_dict=None, **properties):
+    """build the form for a url_hash at idle time and add it to the cache without navigating
+    useful for a page the user is likely to visit next e.g. the next row in a list
+    the prefetch is dropped if a navigation to the same url_hash starts first
+    nothing is prefetched if the url_hash would redirect or change the template
+    """
+    url_hash, url_pattern, url_dict = _process_url_arguments(
+        url_hash, url_pattern=url_pattern, url_dict=url_dict
+    )
+    _prefetch.prefetch(url_hash, url_pattern, url_dict, properties)
+
+
+def prefetch_on_hover(
+    link, url_hash=None, *, url_pattern=None, url_dict=None, delay=100, **properties
+):
+    """prefetch when the pointer rests on the link (or it has focus) for delay milliseconds
+    if no url arguments are provided the link's url is used e.g. Link(url="#article?id=1")
+    """
+    if url_hash is None and url_pattern is None:
+        url_hash = getattr(link, "url", "")
+        if not url_hash.startswith("#"):
+            msg = "provide a url_hash or give the link a url starting with '#'"
+            raise ValueError(msg)
+    url_args = _process_url_arguments(
+        url_hash, url_pattern=url_pattern, url_dict=url_dict
+    )
+    _prefetch.prefetch_on_hover(link, url_args + (properties,), delay)
+
+
+def set_prefetch_limits(max_queued=5, max_concurrent=1):
+    """max_queued         the number of prefetches waiting to run - the oldest are dropped first
+    max_concurrent     the number of prefetches that can be building a form at once
+    """
+    if not (isinstance(max_queued, int) and isinstance(max_concurrent, int)):
+        raise TypeError("max_queued and max_concurrent must be type int")
+    _prefetch.set_limits(max_queued, max_concurrent)
+
+
+def url_for(form, **dynamic_vars_and_keys):
+    """returns the url_hash for a routed form - the reverse of routing
+    the keyword arguments are the dynamic segments of the form's url_pattern and its url_keys
+    e.g. for @routing.route("article/{id}", url_keys=["tab"])
+    routing.url_for(Article, id=3, tab="comments") returns "article/3?tab=comments"
+    form can be the form class or its dotted "module.Form" path
+    set_url_hash() with the returned url_hash skips the url parser and the route matcher
+    """
+    if isinstance(form, str):
+        form_path = form
+    elif isinstance(form, type):
+        form_path = _manifest.get_path(form)
+    else:
+        raise TypeError(f"form must be a form class or a dotted path not {type(form)}")
+    return _r.url_for(form_path, dynamic_vars_and_keys)
+
+
+def get_url_cache_info():
+    """returns the hits, misses, size and max_size of the parsed url_hash cache"""
+    return _parse_cache.info()
+
+
+def set_url_cache_size(max_size=128):
+    """the number of parsed url_hash strings to keep - 0 disables the cache"""
+    if not isinstance(max_size, int):
+        raise TypeError(f"max_size must be type int not {type(max_size)}")
+    if max_size < 0:
+        raise ValueError(f"max_size must not be negative, got {max_size!r}")
+    logger.debug("setting the url cache size to: %r", max_size)
+    _parse_cache.set_max_size(max_size)
+
+
+def get_navigation_timings():
+    """returns the most recent navigation timing records - oldest first
+    each record is a dict with the url_hash, whether the navigation completed,
+    the exit_reason and exit_phase if it exited early, the total seconds,
+    the seconds spent in each phase and the seconds spent in each condition/redirect call
+    calls have cached=True when a cached condition result was used
+    """
+    return _timing.get_history()
+
+
+def clear_navigation_timings():
+    _timing.clear_history()
+
+
+def set_navigation_timing_history(max_size=50):
+    """the number of navigation timing records to keep in memory"""
+    if not isinstance(max_size, int):
+        raise TypeError(f"max_size must be type int not {type(max_size)}")
+    _timing.set_max_history(max_size)
+
+
+def add_navigation_timing_subscriber(callback):
+    """callback is called with each navigation timing record when a navigation finishes"""
+    if not callable(callback):
+        raise TypeError("the callback must be a callable")
+    _timing.add_subscriber(callback)
+
+
+def remove_navigation_timing_subscriber(callback):
+    _timing.remove_subscriber(callback)
+
+
+def invalidate_conditions(tag=None):
+    """forget the cached condition results of templates and redirects e.g. on login or logout
+    tag = None - every cached condition result
+        = str - only conditions declared with this tag e.g. @routing.template(cache_condition="auth")
+    """
+    if not (tag is None or isinstance(tag, str)):
+        raise TypeError(f"tag must be type str or None not {type(tag)}")
+    _conditions.invalidate(tag)
+
+
+def use_compiled_matcher(enabled=True, prefer_static=False):
+    """match routes with a segment trie built per template rather than scanning every route
+    by default the matched route is the same as the linear scan (first registered route wins)
+    prefer_static = True - a static segment beats a {dynamic} segment e.g. 'user/me' beats 'user/{id}'
+    """
+    msg = f"compiled route matcher: enabled={enabled!r}, prefer_static={prefer_static!r}"
+    logger.debug(msg)
+    _r.use_compiled_matcher(enabled, prefer_static)
+
+
+def preload_forms(*forms):
+    """import the forms of routes registered by path when the browser is idle
+    e.g. routing.preload_forms("MyApp.Pages.Article.Article") for the pages a user is likely to visit next
+    with no arguments every route form that has not been imported yet is queued
+    """
+    if not all(isinstance(form, str) for form in forms):
+        raise TypeError("preload_forms expects dotted 'module.Form' paths")
+    if not forms:
+        forms = list(_r._lazy_routes)
+    logger.debug("preloading route forms: %r", forms)
+    _prefetch.preload_forms(forms)
+
+
+def get_route_manifest():
+    """returns a json serializable manifest of the registered routes, templates and redirects
+    call this once every form has been imported and ship the result with the app
+    """
+    return _manifest.generate(_r._routes, _r._ordered_info)
+
+
+def load_route_manifest(manifest):
+    """register every route from a manifest created by get_route_manifest() in one step
+    this must be called before any route forms are imported
+    a route's form is imported the first time one of its routes is matched
+    with debug logging the routes registered by the decorators are checked against the manifest
+    """
+    if not isinstance(manifest, dict):
+        raise TypeError(f"manifest must be type dict not {type(manifest)}")
+    _r.load_manifest(manifest)
+
+
 def set_url_hash(
     url_hash=None,
     *,  # the remaining are keyword only arguments
@@ -119,6 +449,7 @@ def set_url_hash(
     set_in_history=True,
     redirect=True,
     load_from_cache=True,
+    coalesce=None,
     **properties,
 ):
     """either provide a url_hash or a url_pattern or a url_pattern and url_dict
@@ -137,6 +468,11 @@ def set_url_hash(
                         = False -   navigate won't be fired
     load_from_cache     = True -  navigate will load from _cache if the url_hash exists in _cache
                         = False - the url_hash is removed from _cache
+    coalesce            = None - use the global setting from set_url_hash_coalescing()
+                          (calls made during a navigation are never coalesced)
+                        = True - calls made within the debounce window are batched and only the last is applied
+                        = int - as True with a debounce window of this many milliseconds
+                        = False - apply this call now (and drop any pending coalesced call)
 
     properties          any additional kwargs will be passed to the form
     """
@@ -145,33 +481,51 @@ def set_url_hash(
             "cannot do set_in_history=False and replace_current_url=False\nPushing new url without adding to history stack is impossible"
         )
 
-    ### process the url_arguments
+    ### process the url_arguments - before coalescing so bad arguments raise here
     url_hash, url_pattern, url_dict = _process_url_arguments(
         url_hash, url_pattern=url_pattern, url_dict=url_dict
     )
 
+    if coalesce is None:
+        # calls made during a navigation e.g. from a form's __init__ are applied now
+        # so the navigation in progress is marked stale
+        coalesce = _coalesce.enabled and not _r.navigation_context.contexts
+    if coalesce is not False:
+        delay = _coalesce.debounce if coalesce is True else coalesce
+        kws = dict(
+            redirect=redirect, load_from_cache=load_from_cache, coalesce=False
+        )
+        kws.update(properties)
+        url_args = (url_hash, url_pattern, url_dict)
+        _coalesce.coalesce(
+            set_url_hash, delay, url_args, replace_current_url, set_in_history, kws
+        )
+        return
+    _coalesce.cancel()
+
     # remove from cache
     if not load_from_cache:
         remove_from_cache(url_hash)
 
     if (
-        url_hash == get_url_hash()
+        _cache_url_hash(url_hash) == _cache_url_hash(get_url_hash())
         and url_hash in _r._cache
         and _r._current_form is not None
     ) or _r.navigation_context.matches_current_context(url_hash):
         return  # should not continue if url_hash is identical to the addressbar hash!
         # but do continue if the url_hash is not in the cache i.e it was manually removed
 
+    _r.init()  # the history state must be ours before we push to it
     if set_in_history and not replace_current_url:
-        msg = f"setting url_hash to: '#{url_hash}', adding to top of history stack"
+        msg = "setting url_hash to: '#%s', adding to top of history stack"
         _navigation.pushState(url_hash)
     elif set_in_history and replace_current_url:
-        msg = f"setting url_hash to: '#{url_hash}', replacing current_url, setting in history"
+        msg = "setting url_hash to: '#%s', replacing current_url, setting in history"
         _navigation.replaceState(url_hash)
     elif not set_in_history and replace_current_url:
-        msg = f"setting url_hash to: '#{url_hash}', replacing current_url, NOT setting in history"
+        msg = "setting url_hash to: '#%s', replacing current_url, NOT setting in history"
         _navigation.replaceUrlNotState(url_hash)
-    logger.debug(msg)
+    logger.debug(msg, url_hash)
 
     if redirect:
         return _r.navigate(url_hash, url_pattern, url_dict, **properties)
@@ -181,5 +535,18 @@ def set_url_hash(
     logger.debug("navigation not triggered, redirect=False")
 
 
+def set_url_hash_coalescing(enabled=True, debounce=0):
+    """batch rapid set_url_hash calls e.g. from a search box that sets the url_hash on each keystroke
+    only the last call in a burst is applied with a single history operation and a single navigation
+    debounce            = 0 - batch calls made within the same tick
+                        = int - batch calls made within this many milliseconds of each other
+    """
+    if not isinstance(debounce, int):
+        raise TypeError(f"debounce must be type int not {type(debounce)}")
+    logger.debug("set_url_hash coalescing: enabled=%r, debounce=%r", enabled, debounce)
+    _coalesce.enabled = enabled
+    _coalesce.debounce = debounce
+
+
 def load_form(*args, **kws):
     raise RuntimeError("load_form is deprecated")
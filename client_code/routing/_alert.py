@@ -7,7 +7,44 @@
 
 __version__ = "2.1.0"
 
-from anvil.js.window import jQuery as _S
+from anvil.js.window import window
+
+_S = None  # jQuery - looked up on the first navigation rather than on import
+_shown_modals = None  # a js Set of the shown .modal elements - None until installed
+_registry_failed = False
+
+
+def _is_shown(modal):
+    data = _S(modal).data("bs.modal")
+    return data is not None and data.isShown
+
+
+def _install_registry():
+    """track shown modals from bootstrap's events rather than scanning the DOM on every navigation"""
+    global _S, _shown_modals, _registry_failed
+    _S = window.jQuery
+    try:
+        shown = window.Set()
+
+        def on_shown(e, *args):
+            shown.add(e.currentTarget)
+
+        def on_hidden(e, *args):
+            shown.delete(e.currentTarget)
+
+        doc = _S(window.document)
+        # show fires before the fade in - a modal blocks navigation while it fades in
+        doc.on("show.bs.modal", ".modal", on_shown)
+        doc.on("shown.bs.modal", ".modal", on_shown)
+        doc.on("hidden.bs.modal", ".modal", on_hidden)
+        # any modals shown before we started listening
+        for modal in _S(".modal"):
+            if _is_shown(modal):
+                shown.add(modal)
+    except Exception:
+        _registry_failed = True  # fall back to scanning the DOM
+        return
+    _shown_modals = shown
 
 
 def handle_alert_unload() -> bool:
@@ -15,13 +52,20 @@ def handle_alert_unload() -> bool:
     if there is an active alert which is not dismissible then navigation is prevented
     return value indicates whether this function took control of the on_navigation
     """
-    current_alerts = _S(".modal")
-    for alert_modal in current_alerts:
-        alert_modal = _S(alert_modal)
+    if _shown_modals is None and not _registry_failed:
+        _install_registry()
+    if _shown_modals is None:
+        current_alerts = _S(".modal")
+    elif not _shown_modals.size:
+        return False  # the common case - no open modals
+    else:
+        current_alerts = list(_shown_modals)
+    for modal in current_alerts:
+        alert_modal = _S(modal)
         data = alert_modal.data("bs.modal")
-        if data is None:
-            continue
-        elif not data.isShown:
+        if data is None or not data.isShown:
+            if _shown_modals is not None:
+                _shown_modals.delete(modal)  # e.g. its show event was prevented
             continue
         elif data.options and data.options.backdrop != "static":
             # bootstrap alerts have a backdrop of static when not dismissible
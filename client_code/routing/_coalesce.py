@@ -0,0 +1,70 @@
+# SPDX-License-Identifier: MIT
+#
+# Copyright (c) 2021 The Anvil Extras project team members listed at
+# https://github.com/anvilistas/anvil-extras/graphs/contributors
+#
+# This software is published at https://github.com/anvilistas/anvil-extras
+
+from anvil.js.window import window
+
+from ._logging import logger
+
+__version__ = "2.1.0"
+
+enabled = False
+debounce = 0  # milliseconds - 0 coalesces calls made within the same tick
+
+_pending = None
+_timer = None
+
+
+def coalesce(apply, delay, url_args, replace_current_url, set_in_history, kws):
+    """queue a set_url_hash call - only the last call in a burst is applied"""
+    global _pending, _timer
+    pushes = set_in_history and not replace_current_url
+    if _pending is None:
+        _pending = {"pushes": False}
+    else:
+        logger.debug("coalescing set_url_hash call, replacing %r", _pending["url_args"])
+    # if any call in the burst would have pushed to the history stack then we push once
+    _pending["pushes"] = _pending["pushes"] or pushes
+    _pending["url_args"] = url_args
+    _pending["replace_current_url"] = replace_current_url
+    _pending["set_in_history"] = set_in_history
+    _pending["kws"] = kws
+    _pending["apply"] = apply
+    if _timer is not None:
+        window.clearTimeout(_timer)
+    _timer = window.setTimeout(flush, delay)
+
+
+def flush():
+    global _pending, _timer
+    pending, _pending, _timer = _pending, None, None
+    if pending is None:
+        return
+    if pending["pushes"]:
+        replace_current_url, set_in_history = False, True
+    else:
+        replace_current_url = pending["replace_current_url"]
+        set_in_history = pending["set_in_history"]
+    url_hash, url_pattern, url_dict = pending["url_args"]
+    return pending["apply"](
+        url_hash,
+        url_pattern=url_pattern,
+        url_dict=url_dict,
+        replace_current_url=replace_current_url,
+        set_in_history=set_in_history,
+        **pending["kws"],
+    )
+
+
+def cancel():
+    """drop a pending call e.g. the user navigated with the back button"""
+    global _pending, _timer
+    if _pending is None:
+        return
+    logger.debug("dropping coalesced set_url_hash call: %r", _pending["url_args"])
+    if _timer is not None:
+        window.clearTimeout(_timer)
+    _pending = _timer = None
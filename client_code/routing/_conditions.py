@@ -0,0 +1,63 @@
+# SPDX-License-Identifier: MIT
+#
+# Copyright (c) 2021 The Anvil Extras project team members listed at
+# https://github.com/anvilistas/anvil-extras/graphs/contributors
+#
+# This software is published at https://github.com/anvilistas/anvil-extras
+
+from time import time as _time
+
+from ._logging import logger
+
+__version__ = "2.1.0"
+
+_cached_conditions = []
+
+
+class CachedCondition:
+    """a template or redirect condition whose result is reused until invalidated or expired"""
+
+    def __init__(self, condition, tags, ttl):
+        self.condition = condition
+        self.tags = tags
+        self.ttl = ttl
+        self.__name__ = getattr(condition, "__name__", "condition")
+        self._has_result = False
+        self._result = None
+        self._expires = None
+        _cached_conditions.append(self)
+
+    def get(self):
+        """returns (True, result) for a cached result or (False, None)"""
+        if not self._has_result:
+            return False, None
+        if self._expires is not None and _time() >= self._expires:
+            self.invalidate()
+            return False, None
+        return True, self._result
+
+    def set(self, result):
+        self._has_result = True
+        self._result = result
+        self._expires = None if self.ttl is None else _time() + self.ttl
+
+    def invalidate(self):
+        self._has_result = False
+        self._result = self._expires = None
+
+    def __call__(self):
+        has_result, result = self.get()
+        if not has_result:
+            result = self.condition()
+            self.set(result)
+        return result
+
+
+def invalidate(tag=None):
+    """forget cached results - only those with this tag if a tag is given"""
+    count = 0
+    for cached in _cached_conditions:
+        if cached._has_result and (tag is None or tag in cached.tags):
+            cached.invalidate()
+            count += 1
+    logger.debug("invalidated %r cached condition results (tag=%r)", count, tag)
@@ -7,8 +7,16 @@
 
 from functools import wraps
 
-from . import _router
-from ._utils import RedirectInfo, RouteInfo, TemplateInfo, _as_frozen_str_iterable
+from . import _manifest, _router
+from ._conditions import CachedCondition
+from ._utils import (
+    CachePolicy,
+    DataLoader,
+    RedirectInfo,
+    RouteInfo,
+    TemplateInfo,
+    _as_frozen_str_iterable,
+)
 
 __version__ = "2.1.0"
 
@@ -21,8 +29,36 @@ def _check_types_common(path, priority, condition):
     return _as_frozen_str_iterable(path, "path")
 
 
-def template(path="", priority=0, condition=None):
+def _check_cached_condition(condition, cache_condition, condition_ttl):
+    if not (condition_ttl is None or isinstance(condition_ttl, (int, float))):
+        msg = "condition_ttl must be a number of seconds or None not {}"
+        raise TypeError(msg.format(type(condition_ttl)))
+    if cache_condition is False or condition is None:
+        return condition
+    if cache_condition is True:
+        tags = frozenset()
+    else:
+        tags = _as_frozen_str_iterable(cache_condition, "cache_condition")
+    return CachedCondition(condition, tags, condition_ttl)
+
+
+def template(
+    path="", priority=0, condition=None, cache_condition=False, condition_ttl=None
+):
+    """
+    the template decorator above any form that has a content_panel
+
+    path            = str or list of str - the url_hash prefixes this template is used for
+    priority        = int - templates (and redirects) with a higher priority are checked first
+    condition       = a callable returning whether this template should be used
+    cache_condition = False - the condition is called on every navigation
+                    = True - the result is reused until routing.invalidate_conditions() is called
+                    = str or list of str - tags, the result is reused until
+                      routing.invalidate_conditions() is called with one of these tags (or no tag)
+    condition_ttl   = seconds - a cached result older than this is not reused
+    """
     path = _check_types_common(path, priority, condition)
+    condition = _check_cached_condition(condition, cache_condition, condition_ttl)
 
     def template_wrapper(cls):
         info = TemplateInfo(cls, path, condition)
@@ -55,8 +91,15 @@ def template(path="", priority=0, condition=None):
     return template_wrapper
 
 
-def redirect(path, priority=0, condition=None):
+def redirect(
+    path, priority=0, condition=None, cache_condition=False, condition_ttl=None
+):
+    """
+    the redirect decorator above a function that returns the url_hash to redirect to
+    see template() for the arguments
+    """
     path = _check_types_common(path, priority, condition)
+    condition = _check_cached_condition(condition, cache_condition, condition_ttl)
 
     def redirect_wrapper(fn):
         info = RedirectInfo(fn, path, condition)
@@ -66,10 +109,49 @@ def redirect(path, priority=0, condition=None):
     return redirect_wrapper
 
 
-def route(url_pattern="", url_keys=[], title=None, full_width_row=False, template=None):
+def _check_cache_policy(cache, max_instances, ttl):
+    if not isinstance(cache, bool):
+        raise TypeError(f"cache must be type bool not {type(cache)}")
+    if not (max_instances is None or isinstance(max_instances, int)):
+        msg = f"max_instances must be type int or None not {type(max_instances)}"
+        raise TypeError(msg)
+    if max_instances is not None and max_instances < 1:
+        raise ValueError("max_instances must be at least 1")
+    if not (ttl is None or isinstance(ttl, (int, float))):
+        raise TypeError(f"ttl must be a number of seconds or None not {type(ttl)}")
+    return CachePolicy(cache, max_instances, ttl)
+
+
+def route(
+    url_pattern="",
+    url_keys=[],
+    title=None,
+    full_width_row=False,
+    template=None,
+    cache=True,
+    max_instances=None,
+    ttl=None,
+    placeholder=None,
+    loader=None,
+    loader_ttl=None,
+):
     """
     the route decorator above any form you want to load in the content_panel
     @routing.route(url_pattern=str,url_keys=List[str], title=str)
+
+    cache           = False - the form is never added to the cache
+    max_instances   = int - the most instances of this form kept in the cache, least recently used are evicted
+    ttl             = seconds - a cached instance older than this is evicted rather than loaded
+    placeholder     = a component class (or callable returning a component) that is mounted immediately
+                      the form's __init__ is called after the placeholder is shown and the form replaces it when ready
+    loader          = a callable loader(url_dict, dynamic_vars) called before the form's __init__
+                      the result is available as self.route_data and is cached separately from the form
+    loader_ttl      = seconds - a cached loader result older than this is loaded again
+
+    the decorator can also be called with a dotted path to a form rather than the form class
+    the path is the module path followed by the class name - for an anvil form the class is in the module of the same name
+    routing.route("article/{id}")("MyApp.Pages.Article.Article")
+    the module is imported the first time the route is matched, see also routing.preload_forms()
     """
     if not isinstance(url_pattern, str):
         raise TypeError(f"url_pattern must be type str not {type(url_pattern)}")
@@ -77,9 +159,33 @@ def route(url_pattern="", url_keys=[], title=None, full_width_row=False, templat
         raise TypeError(f"title must be type str or None not {type(title)}")
     url_keys = _as_frozen_str_iterable(url_keys, "url_keys")
     template = _as_frozen_str_iterable(template, "template", allow_none=True)
+    cache_policy = _check_cache_policy(cache, max_instances, ttl)
+    if placeholder is not None and not callable(placeholder):
+        raise TypeError("the placeholder must be None or a callable")
+    if loader is not None and not callable(loader):
+        raise TypeError("the loader must be None or a callable")
+    if not (loader_ttl is None or isinstance(loader_ttl, (int, float))):
+        msg = f"loader_ttl must be a number of seconds or None not {type(loader_ttl)}"
+        raise TypeError(msg)
+    loader = None if loader is None else DataLoader(loader, loader_ttl)
 
     def route_wrapper(cls):
-        info = RouteInfo(cls, template, url_pattern, url_keys, title, full_width_row)
+        form = cls
+        if isinstance(cls, str):
+            if "." not in cls:
+                raise ValueError(f"expected a dotted 'module.Form' path not {cls!r}")
+            form = _manifest.get_lazy_form(cls)
+        info = RouteInfo(
+            form,
+            template,
+            url_pattern,
+            url_keys,
+            title,
+            full_width_row,
+            cache_policy=cache_policy,
+            placeholder=placeholder,
+            loader=loader,
+        )
         _router.add_route_info(info)
         return cls
 
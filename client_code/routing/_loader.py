@@ -0,0 +1,114 @@
+# SPDX-License-Identifier: MIT
+#
+# Copyright (c) 2021 The Anvil Extras project team members listed at
+# https://github.com/anvilistas/anvil-extras/graphs/contributors
+#
+# This software is published at https://github.com/anvilistas/anvil-extras
+
+from time import time as _time
+
+from anvil.js import await_promise
+from anvil.js.window import window
+
+from ._logging import logger
+
+__version__ = "2.1.0"
+
+
+class _InFlight:
+    """a loader call in progress - later callers for the same key wait on it"""
+
+    def __init__(self):
+        self.data = None
+        self.error = None
+        self.promise = None
+        self.resolve = None
+
+    def wait(self):
+        if self.promise is None:
+            # only pay for a promise when someone is actually waiting
+            def executor(resolve, reject):
+                self.resolve = resolve
+
+            self.promise = window.Promise(executor)
+        await_promise(self.promise)
+        if self.error is not None:
+            raise self.error
+        return self.data
+
+    def done(self):
+        if self.resolve is not None:
+            self.resolve(None)
+
+
+class DataCache:
+    """route loader results keyed on the route and its normalized parameters
+    the dict order is the recency order - least recently used first
+    """
+
+    def __init__(self, max_size=50):
+        self.max_size = max_size
+        self._entries = {}  # key -> (data, expires)
+        self._in_flight = {}  # key -> _InFlight
+
+    @staticmethod
+    def get_key(route_info, url_dict, dynamic_vars):
+        # url_parts are unchanged when a route_info is prefixed with a template path
+        return (
+            route_info.form,
+            route_info.url_parts,
+            tuple(sorted(url_dict.items())),
+            tuple(sorted(dynamic_vars.items())),
+        )
+
+    def load(self, route_info, url_dict, dynamic_vars):
+        loader = route_info.loader
+        key = self.get_key(route_info, url_dict, dynamic_vars)
+        entries = self._entries
+        entry = entries.pop(key, None)
+        if entry is not None:
+            data, expires = entry
+            if expires is None or expires > _time():
+                entries[key] = entry  # now the most recently used
+                logger.debug("route data for %r loaded from cache", key[0].__name__)
+                return data
+
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None:
+            logger.debug("waiting for route data for %r", key[0].__name__)
+            return in_flight.wait()
+
+        in_flight = self._in_flight[key] = _InFlight()
+        try:
+            data = loader.load(url_dict, dynamic_vars)
+        except Exception as e:
+            in_flight.error = e
+            raise
+        else:
+            in_flight.data = data
+            expires = None if loader.ttl is None else _time() + loader.ttl
+            entries[key] = (data, expires)
+            self._trim()
+        finally:
+            del self._in_flight[key]
+            in_flight.done()
+        return data
+
+    def _trim(self):
+        entries = self._entries
+        while len(entries) > self.max_size:
+            del entries[next(iter(entries))]
+
+    def set_max_size(self, max_size):
+        self.max_size = max_size
+        self._trim()
+
+    def invalidate(self, form=None):
+        if form is None:
+            self._entries.clear()
+            return
+        for key in [key for key in self._entries if key[0] is form]:
+            del self._entries[key]
+
+
+data_cache = DataCache()
@@ -13,10 +13,14 @@ from ..logging import Logger as _Logger
 
 class Logger(_Logger):
     def get_format_params(self, *, msg, **params):
-        from . import _router
-
-        indent = "  " * len(_router.navigation_context.contexts)
-        msg = msg.replace("\n", "\n" + " " * len(f"{indent}{self.name}: "))
+        if "indent" in self._fields:
+            from . import _router
+
+            indent = "  " * len(_router.navigation_context.contexts)
+        else:
+            indent = ""
+        if "\n" in msg:
+            msg = msg.replace("\n", "\n" + " " * len(f"{indent}{self.name}: "))
         return super().get_format_params(indent=indent, msg=msg, **params)
 
     def __setattr__(self, attr: str, value) -> None:
@@ -0,0 +1,163 @@
+# SPDX-License-Identifier: MIT
+#
+# Copyright (c) 2021 The Anvil Extras project team members listed at
+# https://github.com/anvilistas/anvil-extras/graphs/contributors
+#
+# This software is published at https://github.com/anvilistas/anvil-extras
+
+from ._utils import DEFAULT_CACHE_POLICY, CachePolicy, RouteInfo, parse_title
+
+__version__ = "2.1.0"
+
+MANIFEST_VERSION = 1
+
+
+class LazyForm:
+    """stands in for a routed form class that has not been imported yet"""
+
+    def __init__(self, path):
+        self.path = path
+        self.__name__ = path.rsplit(".", 1)[-1]
+        self._cls = None
+
+    def resolve(self):
+        if self._cls is None:
+            module_path, name = self.path.rsplit(".", 1)
+            module = __import__(module_path, fromlist=[name])
+            cls = getattr(module, name)
+            if not isinstance(cls, type):
+                # e.g. "MyApp.Pages.Article" is the module of an anvil form
+                msg = f"{self.path!r} is not a form class"
+                if type(cls) is type(module):
+                    msg += f", did you mean {self.path + '.' + name!r}?"
+                raise TypeError(msg)
+            self._cls = cls
+        return self._cls
+
+    def __repr__(self):
+        return f"<LazyForm {self.path!r}>"
+
+
+_lazy_forms = {}  # path -> LazyForm - routes for the same form share one LazyForm
+
+
+def get_lazy_form(path):
+    lazy_form = _lazy_forms.get(path)
+    if lazy_form is None:
+        lazy_form = _lazy_forms[path] = LazyForm(path)
+    return lazy_form
+
+
+def get_path(obj):
+    if type(obj) is LazyForm:
+        return obj.path
+    return f"{obj.__module__}.{obj.__name__}"
+
+
+def _route_entry(route_info):
+    policy = route_info.cache_policy
+    return {
+        "form": get_path(route_info.form),
+        "template": sorted(route_info.template, key=lambda t: (t is not None, t)),
+        "url_pattern": route_info.url_pattern,
+        "url_keys": sorted(route_info.url_keys),
+        "title": route_info.title,
+        "fwr": route_info.fwr,
+        "url_parts": [list(part) for part in route_info.url_parts],
+        "cache": policy._asdict(),
+    }
+
+
+def generate(routes, ordered_info):
+    """a json serializable manifest of the registered routes, templates and redirects"""
+    entries = []
+    seen = {}
+    index = {}
+    for template, route_infos in routes.items():
+        for route_info in route_infos:
+            key = id(route_info)
+            if key not in seen:
+                seen[key] = len(entries)
+                entries.append(_route_entry(route_info))
+            # the order routes are checked in for each template
+            index.setdefault("" if template is None else template, []).append(seen[key])
+    infos = []
+    for priority, priority_infos in ordered_info.items():
+        for info in priority_infos:
+            infos.append(
+                {
+                    "type": type(info).__name__.replace("_info", ""),
+                    "callable": get_path(info[0]),
+                    "path": sorted(info.path),
+                    "priority": priority,
+                }
+            )
+    return {
+        "version": MANIFEST_VERSION,
+        "routes": entries,
+        "index": index,
+        "info": infos,
+    }
+
+
+def load(manifest):
+    """returns the routes dict {template: [RouteInfo]} built from the manifest
+    url_patterns are not re-parsed and forms are LazyForms until they are imported
+    """
+    if manifest.get("version") != MANIFEST_VERSION:
+        version = manifest.get("version")
+        raise ValueError(f"unsupported route manifest version {version!r}")
+    shared = {}  # templates, url_keys and cache policies are mostly the same objects
+    route_infos = []
+    for entry in manifest["routes"]:
+        form = get_lazy_form(entry["form"])
+        template = _shared(shared, ("template", *entry["template"]), frozenset)
+        url_keys = _shared(shared, ("url_keys", *entry["url_keys"]), frozenset)
+        cache = entry.get("cache")
+        if cache is None:
+            policy = DEFAULT_CACHE_POLICY
+        else:
+            key = ("cache", cache["cache"], cache["max_instances"], cache["ttl"])
+            policy = _shared(shared, key, lambda values: CachePolicy(*values))
+        url_parts = tuple((part, is_dynamic) for part, is_dynamic in entry["url_parts"])
+        title = compiled_title = entry["title"]
+        if title is not None:
+            # titles were checked when the manifest was generated
+            key = ("title", title)
+            compiled_title = _shared(shared, key, lambda values: parse_title(*values))
+        route_infos.append(
+            RouteInfo._make(
+                (
+                    form,
+                    template,
+                    entry["url_pattern"],
+                    url_keys,
+                    title,
+                    entry["fwr"],
+                    url_parts,
+                    policy,
+                    None,  # placeholder and loader are bound when the form is imported
+                    None,
+                    compiled_title,
+                )
+            )
+        )
+    routes = {}
+    for template, indexes in manifest["index"].items():
+        template = None if template == "" else template
+        routes[template] = [route_infos[i] for i in indexes]
+    return routes
+
+
+def _shared(shared, key, make):
+    value = shared.get(key)
+    if value is None:
+        value = shared[key] = make(key[1:])
+    return value
+
+
+def diff_route(manifest_info, route_info):
+    """the fields that differ between a manifest route and its decorator"""
+    manifest_entry = _route_entry(manifest_info)
+    entry = _route_entry(route_info)
+    return [key for key in entry if entry[key] != manifest_entry[key]]
@@ -0,0 +1,109 @@
+# SPDX-License-Identifier: MIT
+#
+# Copyright (c) 2021 The Anvil Extras project team members listed at
+# https://github.com/anvilistas/anvil-extras/graphs/contributors
+#
+# This software is published at https://github.com/anvilistas/anvil-extras
+
+__version__ = "2.1.0"
+
+_NO_MATCH = float("inf")
+
+
+class _Node:
+    def __init__(self):
+        self.static = {}  # segment -> _Node
+        self.dynamic = None  # a single child shared by all {dynamic} segments
+        self.leaves = {}  # frozenset(url_keys) -> route index
+        self.first = _NO_MATCH  # lowest route index anywhere below this node
+
+
+class RouteTrie:
+    """a segment trie over RouteInfo.url_parts
+
+    routes are indexed in the order they would be checked by the linear scan
+    so the default lookup returns the same route as the linear scan would
+    with prefer_static=True a static segment beats a {dynamic} segment at the first point they diverge
+    """
+
+    def __init__(self, route_infos, prefer_static=False):
+        self.routes = list(route_infos)
+        self.prefer_static = prefer_static
+        self.root = _Node()
+        for index, route_info in enumerate(self.routes):
+            self._insert(index, route_info)
+
+    def _insert(self, index, route_info):
+        node = self.root
+        node.first = min(node.first, index)
+        for url_part, is_dynamic in route_info.url_parts:
+            if is_dynamic:
+                if node.dynamic is None:
+                    node.dynamic = _Node()
+                node = node.dynamic
+            else:
+                child = node.static.get(url_part)
+                if child is None:
+                    child = node.static[url_part] = _Node()
+                node = child
+            node.first = min(node.first, index)
+        # the first route registered with these url_keys wins
+        node.leaves.setdefault(route_info.url_keys, index)
+
+    def _search(self, node, given_parts, i, url_keys, best):
+        if node.first >= best:
+            return best  # nothing below here can beat what we already have
+        if i == len(given_parts):
+            index = node.leaves.get(url_keys, _NO_MATCH)
+            return index if index < best else best
+        child = node.static.get(given_parts[i])
+        if child is not None:
+            best = self._search(child, given_parts, i + 1, url_keys, best)
+            if self.prefer_static and best != _NO_MATCH:
+                return best
+        if node.dynamic is not None:
+            best = self._search(node.dynamic, given_parts, i + 1, url_keys, best)
+        return best
+
+    def match(self, given_parts, url_keys):
+        """returns (route_info, dynamic_vars) or None if no route matches"""
+        index = self._search(self.root, given_parts, 0, frozenset(url_keys), _NO_MATCH)
+        if index == _NO_MATCH:
+            return None
+        route_info = self.routes[index]
+        dynamic_vars = {}
+        for given, (url_part, is_dynamic) in zip(given_parts, route_info.url_parts):
+            if is_dynamic:
+                dynamic_vars[url_part] = given
+        return route_info, dynamic_vars
+
+
+class PrefixIndex:
+    """a prefix table over the path frozensets of TemplateInfo/RedirectInfo
+
+    only the prefixes of a url that are actually registered are looked up
+    candidates are yielded in the same priority and insertion order as _ordered_info
+    """
+
+    def __init__(self, ordered_infos):
+        self.infos = list(ordered_infos)
+        self.table = {}  # path -> [order]
+        lengths = set()
+        for order, info in enumerate(self.infos):
+            for path in info.path:
+                self.table.setdefault(path, []).append(order)
+                lengths.add(len(path))
+        self.lengths = sorted(lengths)
+
+    def candidates(self, url_hash):
+        """yields (info, path) for each info with a path that url_hash starts with"""
+        orders = set()
+        num_chars = len(url_hash)
+        for length in self.lengths:
+            if length > num_chars:
+                break
+            orders.update(self.table.get(url_hash[:length], ()))
+        for order in sorted(orders):
+            info = self.infos[order]
+            # an info can have several matching paths - use the same one as a linear scan
+            yield info, next(path for path in info.path if url_hash.startswith(path))
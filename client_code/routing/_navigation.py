@@ -7,18 +7,55 @@
 
 from functools import wraps
 
-from anvil.js.window import history, location, window
+from anvil.js.window import window
 
-from . import _router
+from . import _coalesce, _router
+from ._utils import _cache_url_hash
 
 __version__ = "2.1.0"
 
-# re-initialise the state object which was overridden on load or this is a new session
-state = history.state or {"url": location.hash, "pos": 0}
-history.replaceState(state, "", state["url"])
-
 # undo and pos are used for unload behavior
-current = {"undo": 0, "pos": state["pos"]}
+current = {"undo": 0, "pos": 0}
+_initialized = False
+
+# the url_hash at each history position we know about - used by history aware eviction
+# these are cache keys so they are canonical when canonical urls are enabled
+history_hashes = {}
+seen_hashes = set()  # every url_hash that has been in the history stack
+
+
+def _record(pos, url, discard_forward=False):
+    url_hash = _cache_url_hash(url[1:] if url.startswith("#") else url)
+    history_hashes[pos] = url_hash
+    seen_hashes.add(url_hash)
+    if discard_forward:
+        # the browser drops forward entries when a new entry is pushed
+        for forward_pos in [p for p in history_hashes if p > pos]:
+            del history_hashes[forward_pos]
+
+
+def hashes_near(pos, distance):
+    """the url_hashes reachable within distance back/forward positions of pos"""
+    return {
+        history_hashes[p]
+        for p in range(pos - distance, pos + distance + 1)
+        if p in history_hashes
+    }
+
+
+def init():
+    """take over the history state and popstate - called once before the first navigation"""
+    global _initialized
+    if _initialized:
+        return
+    _initialized = True
+    # re-initialise the state object which was overridden on load or this is a new session
+    state = window.history.state or {"url": window.location.hash, "pos": 0}
+    window.history.replaceState(state, "", state["url"])
+    current["pos"] = state["pos"]
+    _record(state["pos"], state["url"])
+    window.onpopstate = onPopState
+
 
 # Form Unload Behaviour - here we prevent the user from navigating away from the current form
 # while we wait for the unload function to complete
@@ -33,7 +70,7 @@ def onPopState(e):
     global undoing, waiting
     if undoing:
         undoing = False
-        current["pos"] = history.state["pos"]
+        current["pos"] = window.history.state["pos"]
         return
     elif waiting:
         return preventUnloadPopState(e)
@@ -45,22 +82,21 @@ def onPopState(e):
     else:
         current["undo"] = -1
         current["pos"] += 1
-        state = {"url": location.hash, "pos": current["pos"]}
+        state = {"url": window.location.hash, "pos": current["pos"]}
+        _record(state["pos"], state["url"], discard_forward=True)
 
-    history.replaceState(state, "", state["url"])
+    window.history.replaceState(state, "", state["url"])
     # we always favour the state['url'] over location.hash
     # since we allow (replace_current_url=True, set_in_history=False)
 
+    _coalesce.cancel()  # the user navigated so a pending set_url_hash is out of date
     _router.navigate()
 
 
-window.onpopstate = onPopState
-
-
 def stopUnload():
     global undoing
     undoing = True
-    history.go(current["undo"])
+    window.history.go(current["undo"])
 
 
 def preventUnloadPopState(e):
@@ -69,15 +105,15 @@ def preventUnloadPopState(e):
     state = e.state
     if state:
         undoing = True
-        history.go(current["pos"] - state["pos"])  # reverse the navigation
+        window.history.go(current["pos"] - state["pos"])  # reverse the navigation
     else:
         # the user is determined to navigate away and has changed the url manually so let them!
         # Not letting them will break the app...
         current["pos"] += 1
-        state = {"url": location.hash, "pos": current["pos"]}
-        history.replaceState(state, "")
+        state = {"url": window.location.hash, "pos": current["pos"]}
+        window.history.replaceState(state, "")
         window.onbeforeunload = None
-        location.reload()
+        window.location.reload()
 
 
 class PreventUnloading:
@@ -106,19 +142,21 @@ def pushState(url):
     current["pos"] += 1
     current["undo"] = -1
     state = {"url": url, "pos": current["pos"]}
-    history.pushState(state, "", url)
+    window.history.pushState(state, "", url)
+    _record(state["pos"], url, discard_forward=True)
 
 
 @ensure_hash
 def replaceState(url):
     # set_in_history=True, replace_current_url=True
     current["undo"] = 0
-    state = {"url": url, "pos": history.state["pos"]}
-    history.replaceState(state, "", url)
+    state = {"url": url, "pos": window.history.state["pos"]}
+    window.history.replaceState(state, "", url)
+    _record(state["pos"], url)  # the replaced url_hash is no longer in history here
 
 
 @ensure_hash
 def replaceUrlNotState(url):
     # set_in_history=False, replace_current_url=True
     current["undo"] = 0
-    history.replaceState(history.state, "", url)
+    window.history.replaceState(window.history.state, "", url)
@@ -0,0 +1,146 @@
+# SPDX-License-Identifier: MIT
+#
+# Copyright (c) 2021 The Anvil Extras project team members listed at
+# https://github.com/anvilistas/anvil-extras/graphs/contributors
+#
+# This software is published at https://github.com/anvilistas/anvil-extras
+
+from anvil.js import get_dom_node
+from anvil.js.window import window
+
+from . import _manifest, _router
+from ._logging import logger
+
+__version__ = "2.1.0"
+
+_queued = []  # oldest first - the most recently requested prefetch runs first
+_running = []
+_scheduled = False
+_preloading = []  # form paths to import when the browser is idle
+max_queued = 5
+max_concurrent = 1
+
+
+class _PrefetchJob:
+    def __init__(self, url_hash, url_pattern, url_dict, properties):
+        self.url_hash = url_hash
+        self.url_pattern = url_pattern
+        self.url_dict = url_dict
+        self.properties = properties
+        self.cancelled = False
+
+    def is_cancelled(self):
+        return self.cancelled
+
+
+def _is_pending(url_hash):
+    return any(job.url_hash == url_hash for job in _queued + _running)
+
+
+def prefetch(url_hash, url_pattern, url_dict, properties):
+    if url_hash in _router._cache or _is_pending(url_hash):
+        return
+    logger.debug("queuing prefetch: %r", url_hash)
+    _queued.append(_PrefetchJob(url_hash, url_pattern, url_dict, properties))
+    if len(_queued) > max_queued:
+        dropped = _queued.pop(0)
+        logger.debug("prefetch queue full, dropping: %r", dropped.url_hash)
+    _schedule()
+
+
+def cancel(url_hash):
+    """called when a real navigation starts - any prefetch for url_hash is dropped"""
+    if not (_queued or _running):
+        return
+    for job in _queued + _running:
+        if job.url_hash == url_hash:
+            logger.debug("cancelling prefetch: %r", url_hash)
+            job.cancelled = True
+    _queued[:] = [job for job in _queued if not job.cancelled]
+
+
+def set_limits(queued, concurrent):
+    global max_queued, max_concurrent
+    max_queued = queued
+    max_concurrent = concurrent
+    del _queued[: max(len(_queued) - queued, 0)]
+
+
+def _schedule():
+    global _scheduled
+    if _scheduled or not _queued or len(_running) >= max_concurrent:
+        return
+    _scheduled = True
+    _on_idle(_run_next)
+
+
+def _on_idle(fn):
+    request_idle = getattr(window, "requestIdleCallback", None)
+    if request_idle is not None:
+        request_idle(fn)
+    else:
+        window.setTimeout(fn, 0)
+
+
+def _run_next(*args):
+    global _scheduled
+    _scheduled = False
+    if not _queued or len(_running) >= max_concurrent:
+        return
+    job = _queued.pop()
+    _running.append(job)
+    try:
+        url_args = (job.url_hash, job.url_pattern, job.url_dict)
+        _router.prefetch_form(*url_args, job.properties, job.is_cancelled)
+    except Exception as e:
+        # prefetching is best effort - a real navigation will surface the error
+        logger.debug("prefetch %r failed: %r", job.url_hash, e)
+    finally:
+        _running.remove(job)
+    _schedule()
+
+
+def preload_forms(paths):
+    """import the forms of routes registered by path - one per idle callback"""
+    queue_was_empty = not _preloading
+    _preloading.extend(path for path in paths if path not in _preloading)
+    if queue_was_empty and _preloading:
+        _on_idle(_preload_next)
+
+
+def _preload_next(*args):
+    if not _preloading:
+        return
+    lazy_form = _manifest.get_lazy_form(_preloading.pop(0))
+    try:
+        if lazy_form.path in _router._lazy_routes:
+            _router.resolve_lazy_form(lazy_form)
+    except Exception as e:
+        # a real navigation will surface the error
+        logger.debug("preloading %r failed: %r", lazy_form.path, e)
+    if _preloading:
+        _on_idle(_preload_next)
+
+
+def prefetch_on_hover(component, url_args, delay):
+    """prefetch url_args after the pointer rests on the component for delay milliseconds"""
+    timer = [None]
+
+    def start(e):
+        if timer[0] is None:
+            timer[0] = window.setTimeout(fire, delay)
+
+    def stop(e):
+        if timer[0] is not None:
+            window.clearTimeout(timer[0])
+            timer[0] = None
+
+    def fire():
+        timer[0] = None
+        prefetch(*url_args)
+
+    node = get_dom_node(component)
+    node.addEventListener("mouseenter", start)
+    node.addEventListener("focus", start)
+    node.addEventListener("mouseleave", stop)
+    node.addEventListener("blur", stop)
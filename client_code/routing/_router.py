@@ -7,13 +7,24 @@
 
 from functools import wraps
 from itertools import chain
+from time import time as _time
 
 from anvil import get_open_form, open_form
-from anvil.js.window import document
+from anvil.js.window import window
 
+from . import _loader, _manifest, _snapshots, _timing, _utils
 from ._alert import handle_alert_unload as _handle_alert_unload
-from ._logging import logger
-from ._utils import TemplateInfo, get_url_components
+from ._conditions import CachedCondition
+from ._logging import DEBUG, logger
+from ._matcher import PrefixIndex, RouteTrie
+from ._utils import (
+    DEFAULT_CACHE_POLICY,
+    TemplateInfo,
+    UrlFormatter,
+    _parse_cache,
+    get_url_components,
+    render_title,
+)
 
 __version__ = "2.1.0"
 
@@ -28,6 +39,12 @@ class navigation_context:
     def __init__(self, url_hash):
         self.is_stale = False
         self.url_hash = url_hash
+        self.timing = _timing.NavigationTiming(url_hash)
+
+    @classmethod
+    def current_timing(cls):
+        contexts = cls.contexts
+        return contexts[-1].timing if contexts else _timing.null_timing
 
     @classmethod
     def check_stale(cls):
@@ -38,7 +55,10 @@ class navigation_context:
     @classmethod
     def matches_current_context(cls, url_hash):
         current = cls.contexts and cls.contexts[-1]
-        return current and current.url_hash == url_hash and not current.is_stale
+        if not current or current.is_stale:
+            return False
+        cache_url_hash = _utils._cache_url_hash
+        return cache_url_hash(current.url_hash) == cache_url_hash(url_hash)
 
     @classmethod
     def mark_all_stale(cls):
@@ -47,7 +67,7 @@ class navigation_context:
 
     def __enter__(self):
         num_contexts = len(self.contexts)
-        logger.debug(f"entering navigation level: {num_contexts}")
+        logger.debug("entering navigation level: %s", num_contexts)
         self.mark_all_stale()
         self.contexts.append(self)
         if num_contexts >= 10:
@@ -60,8 +80,9 @@ class navigation_context:
 
     def __exit__(self, exc_type, *args):
         self.contexts.pop()
+        self.timing.finish(exc_type)
         num_contexts = len(self.contexts)
-        logger.debug(f"exiting navigation level: {num_contexts}")
+        logger.debug("exiting navigation level: %s", num_contexts)
         if not num_contexts:
             logger.debug("navigation complete\n")
         if exc_type is NavigationExit:
@@ -71,6 +92,8 @@ class navigation_context:
 def _update_key(key):
     if type(key) is str:
         key = (key, type(get_open_form()).__name__)
+    if _utils.canonical_urls:
+        key = (_utils.canonical_url_hash(key[0]), key[1])
     return key
 
 
@@ -82,30 +105,311 @@ def _wrap_method(method):
     return wrapped
 
 
+class _CacheStats:
+    counters = (
+        "hits",
+        "misses",
+        "cross_template_hits",
+        "inserts",
+        "evictions",
+        "removals",
+    )
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.totals = dict.fromkeys(self.counters, 0)
+        self.by_form = {}
+        self.by_template = {}
+
+    def record(self, counter, form_name, template_name):
+        self.totals[counter] += 1
+        for breakdown, name in (
+            (self.by_form, form_name),
+            (self.by_template, template_name),
+        ):
+            counts = breakdown.get(name)
+            if counts is None:
+                counts = breakdown[name] = dict.fromkeys(self.counters, 0)
+            counts[counter] += 1
+
+    def snapshot(self, cache):
+        by_form = {name: dict(counts, size=0) for name, counts in self.by_form.items()}
+        by_template = {
+            name: dict(counts, size=0) for name, counts in self.by_template.items()
+        }
+        empty = dict.fromkeys(self.counters, 0)
+        for (_, template_name), form in dict.items(cache):
+            form_name = type(form).__name__
+            by_form.setdefault(form_name, dict(empty, size=0))["size"] += 1
+            by_template.setdefault(template_name, dict(empty, size=0))["size"] += 1
+        return dict(
+            self.totals,
+            size=len(cache),
+            max_size=cache.max_size,
+            by_form=by_form,
+            by_template=by_template,
+        )
+
+
 class _Cache(dict):
-    __getitem__ = _wrap_method(dict.__getitem__)
-    __setitem__ = _wrap_method(dict.__setitem__)
-    __delitem__ = _wrap_method(dict.__delitem__)
-    __contains__ = _wrap_method(dict.__contains__)
-    get = _wrap_method(dict.get)
-    pop = _wrap_method(dict.pop)
-    setdefault = _wrap_method(dict.setdefault)
+    """keys are (url_hash, template_name)
+    the dict order is the recency order - least recently used first
+    """
+
+    def __init__(self):
+        dict.__init__(self)
+        self.max_size = None  # None is unbounded
+        self._expires = {}  # key -> expiry time for routes with a ttl
+        # secondary indexes for invalidate() - index name -> value -> set of keys
+        self._indexes = {"url_pattern": {}, "form": {}, "template": {}, "tag": {}}
+        self._tags = {}  # key -> the tags the key is indexed under
+
+    def _is_expired(self, key):
+        expires = self._expires.get(key)
+        if expires is None or expires > _time():
+            return False
+        return dict.get(self, key) is not _current_form
+
+    def _getitem(self, key):
+        if self._is_expired(key):
+            self._evict(key, "ttl expired")
+        form = dict.pop(self, key)
+        dict.__setitem__(self, key, form)  # now the most recently used
+        return form
+
+    def _setitem(self, key, form):
+        policy = getattr(form, "_routing_props", {}).get("cache_policy")
+        policy = policy or DEFAULT_CACHE_POLICY
+        self._expires.pop(key, None)
+        replaced = dict.pop(self, key, None)
+        if replaced is not None:
+            self._unindex(key, replaced)
+        if not policy.cache:
+            logger.debug("not caching %r, cache=False", key)
+            return
+        dict.__setitem__(self, key, form)
+        self._index(key, form)
+        _cache_stats.record("inserts", type(form).__name__, key[1])
+        if policy.ttl is not None:
+            self._expires[key] = _time() + policy.ttl
+        if policy.max_instances is not None:
+            cls = type(form)
+            keys = [k for k, f in dict.items(self) if type(f) is cls]
+            self._evict_lru(keys, len(keys) - policy.max_instances, "max_instances")
+        if self.max_size is not None:
+            num_to_evict = len(self) - self.max_size
+            self._evict_lru(self._eviction_order(), num_to_evict, "max_size")
+
+    def _delitem(self, key):
+        self._expires.pop(key, None)
+        self._unindex(key, dict.pop(self, key))
+
+    def _contains(self, key):
+        if self._is_expired(key):
+            self._evict(key, "ttl expired")
+        return dict.__contains__(self, key)
+
+    def _get(self, key, default=None):
+        try:
+            return self._getitem(key)
+        except KeyError:
+            return default
+
+    def _pop(self, key, *default):
+        self._expires.pop(key, None)
+        if not dict.__contains__(self, key):
+            return dict.pop(self, key, *default)
+        form = dict.pop(self, key)
+        self._unindex(key, form)
+        return form
 
+    def _setdefault(self, key, default=None):
+        if not self._contains(key):
+            self._setitem(key, default)
+        return dict.get(self, key, default)
+
+    __getitem__ = _wrap_method(_getitem)
+    __setitem__ = _wrap_method(_setitem)
+    __delitem__ = _wrap_method(_delitem)
+    __contains__ = _wrap_method(_contains)
+    get = _wrap_method(_get)
+    pop = _wrap_method(_pop)
+    setdefault = _wrap_method(_setdefault)
+
+    def clear(self):
+        self._expires.clear()
+        for index in self._indexes.values():
+            index.clear()
+        self._tags.clear()
+        dict.clear(self)
+
+    def _remove(self, key):
+        form = self._pop(key, None)
+        if form is not None:
+            _cache_stats.record("removals", type(form).__name__, key[1])
+        return form
 
-default_title = document.title
+    remove = _wrap_method(_remove)
+
+    def remove_all(self):
+        for (_, template_name), form in dict.items(self):
+            _cache_stats.record("removals", type(form).__name__, template_name)
+        self.clear()
+
+    def _index_entries(self, key, form, tags):
+        indexes = self._indexes
+        # both the url_pattern e.g. "article/1" and the route's e.g. "article/{id}"
+        url_pattern = key[0].split("?", 1)[0]
+        yield indexes["url_pattern"], url_pattern
+        route_pattern = getattr(form, "_routing_props", {}).get("route_pattern")
+        if route_pattern is not None and route_pattern != url_pattern:
+            yield indexes["url_pattern"], route_pattern
+        yield indexes["form"], type(form)
+        yield indexes["template"], key[1]
+        for tag in tags:
+            yield indexes["tag"], tag
+
+    def _index(self, key, form):
+        tags = self._tags[key] = frozenset(getattr(form, "cache_tags", None) or ())
+        for index, value in self._index_entries(key, form, tags):
+            keys = index.get(value)
+            if keys is None:
+                keys = index[value] = set()
+            keys.add(key)
+
+    def _unindex(self, key, form):
+        tags = self._tags.pop(key, ())
+        for index, value in self._index_entries(key, form, tags):
+            keys = index.get(value)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del index[value]
+
+    def update_tags(self, form):
+        """re-index the form's cache_tags e.g. they were set in its __init__"""
+        for key in list(self._indexes["form"].get(type(form), ())):
+            if dict.get(self, key) is form:
+                self._unindex(key, form)
+                self._index(key, form)
+
+    def find(self, **criteria):
+        """the keys matching every given index value e.g. find(form=Article, tag="a:1")
+        proportional to the size of the smallest matching index entry not the cache
+        """
+        matches = []
+        for name, value in criteria.items():
+            if value is not None:
+                matches.append(self._indexes[name].get(value, ()))
+        if not matches:
+            return []
+        matches.sort(key=len)
+        first, rest = matches[0], matches[1:]
+        return [key for key in first if all(key in keys for keys in rest)]
+
+    def invalidate(self, **criteria):
+        """remove the forms matching every given index value - returns the number removed"""
+        keys = self.find(**criteria)
+        for key in keys:
+            self._remove(key)
+        return len(keys)
+
+    def set_max_size(self, max_size):
+        self.max_size = max_size
+        if max_size is not None:
+            self._evict_lru(self._eviction_order(), len(self) - max_size, "max_size")
+
+    def _eviction_order(self):
+        keys = list(dict.keys(self))
+        reachable = get_reachable_hashes()
+        if reachable is None:
+            return keys
+        # forms that back/forward can't reach go first
+        return [k for k in keys if k[0] not in reachable] + [
+            k for k in keys if k[0] in reachable
+        ]
+
+    def evict_unreachable(self, reachable, seen):
+        """evict forms whose url_hash was in the history stack but is no longer reachable"""
+        for key in list(dict.keys(self)):
+            url_hash = key[0]
+            if url_hash in reachable or url_hash not in seen:
+                continue  # never in history e.g. prefetched forms are left to the lru
+            if dict.__getitem__(self, key) is _current_form:
+                continue
+            self._evict(key, "outside the history window")
+            seen.discard(url_hash)  # until it is in the history again e.g. prefetched
+
+    def _evict_lru(self, keys, num_to_evict, reason):
+        # keys are in recency order so the least recently used are evicted first
+        for key in keys:
+            if num_to_evict <= 0:
+                return
+            if dict.__getitem__(self, key) is _current_form:
+                continue  # never evict the current form
+            self._evict(key, reason)
+            num_to_evict -= 1
+
+    def _evict(self, key, reason):
+        form = dict.pop(self, key)
+        self._expires.pop(key, None)
+        self._unindex(key, form)
+        _cache_stats.record("evictions", type(form).__name__, key[1])
+        logger.debug("evicting %r from cache (%s)", key, reason)
+        if any(f is form for f in dict.values(self)):
+            return  # still cached with another key
+        unmount_kept_alive_form(form)
+        on_evict = getattr(form, "on_evict", None)
+        if on_evict is not None:
+            on_evict()
+
+
+default_title = None  # the document title before routing changed it, read by init()
+_initialized = False
 
 _current_form = None
 _cache = _Cache()
+_cache_stats = _CacheStats()
 _routes = {}
 _templates = set()
 _ordered_info = {}
 _error_form = None
 _ready = False
 _queued = []
+_info_index = None  # PrefixIndex over _ordered_info built on first use
+_matchers = None  # template name -> RouteTrie, None when using the linear scan
+_url_formatters = None  # form path -> [UrlFormatter] built on the first url_for
+_route_groups = None  # (num url_parts, url_keys) -> first part -> routes
+_resolved_routes = {}  # url_hash -> (route_info, dynamic_vars) from url_for
+MAX_RESOLVED_ROUTES = 128
+_prefer_static = False
+_keep_alive = 0  # the number of forms kept mounted in the content_panel, 0 is disabled
+_mounted = []  # forms mounted in keep alive mode - the visible form is last
+_mounted_panel = None
+_lazy_routes = {}  # form path -> [(RouteInfo, positions)] whose form is not imported
+_history_window = None  # keep forms within this many history positions, None is off
+_manifest_infos = {}  # (type, callable path, path) -> priority from the manifest
+_manifest_loaded = False
+
+
+def init():
+    """browser side effects happen here rather than on import - only the first call does anything"""
+    global _initialized, default_title
+    if _initialized:
+        return
+    _initialized = True
+    logger.debug("initializing routing")
+    default_title = window.document.title
+    from . import _navigation
+
+    _navigation.init()
 
 
 def launch():
     global _ready
+    init()
     _ready = True
     if not _queued:
         return navigate()
@@ -117,47 +421,69 @@ def launch():
 
 
 def navigate(url_hash=None, url_pattern=None, url_dict=None, **properties):
+    if not _initialized:
+        init()
     if not _ready:
-        msg = f"routing is not ready or the template has not finished loading: queuing the call {url_hash!r}"
-        logger.debug(msg)
+        msg = "routing is not ready or the template has not finished loading: queuing the call %r"
+        logger.debug(msg, url_hash)
         _queued.append([(url_hash, url_pattern, url_dict), properties])
         return
     if url_hash is None:
         url_hash, url_pattern, url_dict = get_url_components()
     if navigation_context.matches_current_context(url_hash):
         return
+    from . import _prefetch
+
+    _prefetch.cancel(url_hash)  # a real navigation beats a prefetch
 
-    msg = f"navigation triggered: url_hash={url_hash!r}, url_pattern={url_pattern!r}, url_dict={url_dict}"
-    logger.debug(msg)
+    msg = "navigation triggered: url_hash=%r, url_pattern=%r, url_dict=%s"
+    logger.debug(msg, url_hash, url_pattern, url_dict)
 
     global _current_form
     with navigation_context(url_hash) as nav_context:
+        timing = nav_context.timing
         # it could be initially stale if there are 10+ active contexts
         nav_context.check_stale()
-        handle_alert_unload()
-        handle_form_unload()
+        with timing.phase("handle_alert_unload"):
+            handle_alert_unload()
+        with timing.phase("handle_form_unload"):
+            handle_form_unload()
+        if _snapshots.enabled and _current_form is not None:
+            _snapshots.save(_current_form)
         nav_context.check_stale()
-        template_info, init_path = load_template_or_redirect(url_pattern)
+        with timing.phase("load_template_or_redirect"):
+            template_info, init_path = load_template_or_redirect(url_pattern)
         url_args = {
             "url_hash": url_hash,
             "url_pattern": url_pattern,
             "url_dict": url_dict,
         }
-        alert_on_navigation(**url_args)
+        with timing.phase("on_navigation"):
+            alert_on_navigation(**url_args)
         nav_context.check_stale()
-        clear_container()
+        with timing.phase("clear_container"):
+            clear_container()
         form = _cache.get(url_hash)
         if form is None:
             form = get_form_to_add(
                 template_info, init_path, url_hash, url_pattern, url_dict, properties
             )
         else:
-            logger.debug(f"loading route: {form.__class__.__name__!r} from cache")
+            template_name = template_info.form.__name__
+            _cache_stats.record("hits", type(form).__name__, template_name)
+            logger.debug("loading route: %r from cache", type(form).__name__)
         nav_context.check_stale()
         _current_form = form
-        update_form_attrs(form)
-        add_form_to_container(form)
-        alert_form_loaded(form=form, **url_args)
+        if _history_window is not None:
+            trim_to_history_window()
+        with timing.phase("update_form_attrs"):
+            update_form_attrs(form, url_hash, url_pattern, url_dict)
+        with timing.phase("add_form_to_container"):
+            add_form_to_container(form)
+        if getattr(form, "_routing_deferred_form", None) is not None:
+            return  # on_form_load is called for the deferred form when it replaces this
+        with timing.phase("on_form_load"):
+            alert_form_loaded(form=form, **url_args)
 
 
 def handle_alert_unload():
@@ -174,8 +500,8 @@ def handle_form_unload():
 
     with _navigation.PreventUnloading():
         if before_unload():
-            msg = f"stop unload called from route: {_current_form.__class__.__name__}"
-            logger.debug(msg)
+            msg = "stop unload called from route: %s"
+            logger.debug(msg, type(_current_form).__name__)
             _navigation.stopUnload()
             raise NavigationExit
 
@@ -188,19 +514,16 @@ def load_template_or_redirect(url_hash):
         raise NavigationExit  # not using templates
 
     logger.debug("checking templates and redirects")
-    for info in chain.from_iterable(_ordered_info.values()):
-        callable_, paths, condition = info
-        try:
-            path = next(path for path in paths if url_hash.startswith(path))
-        except StopIteration:
-            continue
+    timing = navigation_context.current_timing()
+    for info, path in get_info_index().candidates(url_hash):
+        callable_, _, condition = info
         if condition is None:
             break
-        elif not condition():
+        elif not check_condition(timing, callable_.__name__, condition):
             continue
         elif type(info) is TemplateInfo:
             break
-        redirect_hash = callable_()
+        redirect_hash = timing.call("redirect", callable_.__name__, callable_)
         if isinstance(redirect_hash, str):
             if navigation_context.matches_current_context(redirect_hash):
                 # would cause an infinite loop
@@ -209,54 +532,79 @@ def load_template_or_redirect(url_hash):
 
             from . import set_url_hash
 
-            logger.debug(f"redirecting to url_hash: {redirect_hash!r}")
+            logger.debug("redirecting to url_hash: %r", redirect_hash)
 
             set_url_hash(
                 redirect_hash,
                 set_in_history=False,
                 redirect=True,
                 replace_current_url=True,
+                coalesce=False,  # the redirect must happen before this navigation goes on
             )
         navigation_context.check_stale()
 
     else:
         load_error_or_raise(f"no template for url_hash={url_hash!r}")
     if current_cls is callable_:
-        logger.debug(f"unchanged template: {callable_.__name__!r}")
+        logger.debug("unchanged template: %r", callable_.__name__)
         return info, path
     else:
-        msg = f"changing template: {current_cls.__name__!r} -> {callable_.__name__!r}"
-        logger.debug(msg)
+        msg = "changing template: %r -> %r"
+        logger.debug(msg, current_cls.__name__, callable_.__name__)
         _current_form = None
         # mark context as stale so that this context is no longer considered the current context
         navigation_context.mark_all_stale()
-        f = callable_()
-        logger.debug(f"loaded template: {callable_.__name__!r}, re-navigating")
+        f = timing.call("template", callable_.__name__, callable_)
+        logger.debug("loaded template: %r, re-navigating", callable_.__name__)
         open_form(f)
         raise NavigationExit
 
 
+def check_condition(timing, name, condition):
+    if type(condition) is not CachedCondition:
+        return timing.call("condition", name, condition)
+    has_result, result = condition.get()
+    if has_result:
+        logger.debug("using the cached condition result for %r: %r", name, result)
+        timing.cached("condition", name)
+        return result
+    result = timing.call("condition", name, condition.condition)
+    condition.set(result)
+    return result
+
+
+def get_info_index():
+    global _info_index
+    if _info_index is None:
+        _info_index = PrefixIndex(chain.from_iterable(_ordered_info.values()))
+    return _info_index
+
+
 def alert_on_navigation(**url_args):
     f = get_open_form()
     on_navigation = getattr(f, "on_navigation", None)
     if on_navigation is not None:
-        logger.debug(f"{f.__class__.__name__}.on_navigation() called")
+        logger.debug("%s.on_navigation() called", type(f).__name__)
         on_navigation(unload_form=_current_form, **url_args)
 
 
 def clear_container():
+    if _keep_alive:
+        return  # the visible form is hidden when the next form is added
     get_open_form().content_panel.clear()
 
 
-def check_cached_templates(route_info, url_hash):
+def check_cached_templates(route_info, url_hash, template_name):
     templates = route_info.template
     if len(templates) <= 1:
         return
     for template in templates:
         form = _cache.get((url_hash, template), None)
         if form is not None:
-            msg = f"loading route: {form.__class__.__name__!r} from cache - cached with {template!r}"
-            logger.debug(msg)
+            form_name = type(form).__name__
+            _cache_stats.record("cross_template_hits", form_name, template_name)
+            msg = "loading route: %r from cache - cached with %r"
+            logger.debug(msg, type(form).__name__, template)
             return form
 
 
@@ -264,33 +612,189 @@ def get_form_to_add(
     template_info, init_path, url_hash, url_pattern, url_dict, properties
 ):
     global _current_form
-    route_info, dynamic_vars = path_matcher(
-        template_info, init_path, url_hash, url_pattern, url_dict
-    )
+    timing = navigation_context.current_timing()
+    with timing.phase("path_matcher"):
+        resolved = get_resolved_route(template_info, init_path, url_hash)
+        if resolved is None:
+            resolved = path_matcher(
+                template_info, init_path, url_hash, url_pattern, url_dict
+            )
+        route_info, dynamic_vars = resolved
 
     # check if path is cached with another template
-    form = check_cached_templates(route_info, url_hash)
+    template_name = template_info.form.__name__
+    form = check_cached_templates(route_info, url_hash, template_name)
     if form is not None:
         return form
+    _cache_stats.record("misses", route_info.form.__name__, template_name)
 
-    form = route_info.form.__new__(route_info.form, **properties)
-    logger.debug(f"adding route: {form.__class__.__name__!r} to cache")
+    form = new_route_form(
+        route_info, dynamic_vars, url_hash, url_pattern, url_dict, properties
+    )
+    if _snapshots.enabled:
+        form.route_snapshot = _snapshots.take(url_hash, form)
+    if route_info.placeholder is not None:
+        return defer_form_init(form, route_info, properties)
+    logger.debug("adding route: %r to cache", type(form).__name__)
     _current_form = _cache[url_hash] = form
+    with timing.phase("loader"):
+        load_route_data(form, route_info)
+    if _current_form is not form:
+        raise NavigationExit  # we navigated away while loading
+    with timing.phase("form_init"):
+        # this might be slow if it does a bunch of server calls
+        form.__init__(**properties)
+    _cache.update_tags(form)
+    if _current_form is not form:
+        msg = "problem loading route: %r. Another form was during the call to __init__. exiting this navigation"
+        logger.debug(msg, type(form).__name__)
+        # and if it was slow, and some navigation happened we should end now
+        raise NavigationExit
+    return form
+
+
+def defer_form_init(form, route_info, properties):
+    """returns the placeholder to mount now - the form is initialized after the next paint"""
+    global _current_form
+    placeholder = route_info.placeholder()
+    placeholder._routing_props = form._routing_props
+    placeholder.dynamic_vars = form.dynamic_vars
+    placeholder._routing_deferred_form = form
+    logger.debug("mounting placeholder for route: %r", type(form).__name__)
+    _current_form = placeholder
+    schedule_deferred_init(form, placeholder, route_info, properties)
+    return placeholder
+
+
+def schedule_deferred_init(
+    form, placeholder, route_info, properties, initialized=False
+):
+    args = (form, placeholder, route_info, properties, initialized)
+
+    def init_after_paint(*_):
+        window.setTimeout(lambda: init_deferred_form(*args), 0)
+
+    window.requestAnimationFrame(init_after_paint)
+
+
+def init_deferred_form(
+    form, placeholder, route_info, properties, initialized=False
+):
+    """initialize the form and swap it for the placeholder while the placeholder is current
+    on_form_load is only called for the form, not the placeholder
+    """
+    global _current_form
+    if _current_form is not placeholder:
+        logger.debug("deferred route: %r discarded", type(form).__name__)
+        return
+    if navigation_context.contexts:
+        # another navigation is in progress - it may still leave the placeholder mounted
+        schedule_deferred_init(form, placeholder, route_info, properties, initialized)
+        return
+    url_hash = form.url_hash
+    with navigation_context(url_hash) as nav_context:
+        timing = nav_context.timing
+        if not initialized:
+            with timing.phase("loader"):
+                load_route_data(form, route_info)
+            nav_context.check_stale()
+            with timing.phase("form_init"):
+                form.__init__(**properties)
+            initialized = True
+        nav_context.check_stale()
+        if _current_form is not placeholder:
+            raise NavigationExit
+        logger.debug("swapping placeholder for route: %r", type(form).__name__)
+        logger.debug("adding route: %r to cache", type(form).__name__)
+        _current_form = _cache[url_hash] = form  # after __init__ so cache_tags are set
+        with timing.phase("update_form_attrs"):
+            update_form_attrs(form, url_hash, form.url_pattern, form.url_dict)
+        with timing.phase("add_form_to_container"):
+            add_form_to_container(form)
+        with timing.phase("on_form_load"):
+            alert_form_loaded(
+                form=form,
+                url_hash=url_hash,
+                url_pattern=form.url_pattern,
+                url_dict=form.url_dict,
+            )
+    if _current_form is placeholder:
+        # a navigation started while we were loading but left the placeholder mounted
+        schedule_deferred_init(form, placeholder, route_info, properties, initialized)
+
+
+def new_route_form(
+    route_info, dynamic_vars, url_hash, url_pattern, url_dict, properties
+):
+    """create the form for a route without calling __init__"""
+    form = route_info.form.__new__(route_info.form, **properties)
     form._routing_props = {
-        "title": route_info.title,
+        "title": route_info.compiled_title,
         "layout_props": {"full_width_row": route_info.fwr},
+        "cache_policy": route_info.cache_policy,
+        "route_pattern": route_info.url_pattern,
     }
     form.url_keys = route_info.url_keys
     form.url_pattern = url_pattern
     form.url_dict = url_dict
     form.url_hash = url_hash
     form.dynamic_vars = dynamic_vars
-    form.__init__(**properties)  # this might be slow if it does a bunch of server calls
-    if _current_form is not form:
-        msg = f"problem loading route: {form.__class__.__name__!r}. Another form was during the call to __init__. exiting this navigation"
-        logger.debug(msg)
-        # and if it was slow, and some navigation happened we should end now
-        raise NavigationExit
+    form.route_data = None
+    form.route_snapshot = None
+    return form
+
+
+def load_route_data(form, route_info):
+    """call the route's loader (or get its result from the data cache) before __init__"""
+    if route_info.loader is None:
+        return
+    data_cache = _loader.data_cache
+    form.route_data = data_cache.load(route_info, form.url_dict, form.dynamic_vars)
+
+
+def find_template(url_hash):
+    """the template info and path that would be used for url_hash without redirecting
+    returns None if a redirect would be followed or no template matches
+    """
+    for info, path in get_info_index().candidates(url_hash):
+        condition = info.condition
+        if condition is not None and not condition():
+            continue
+        return (info, path) if type(info) is TemplateInfo else None
+
+
+def prefetch_form(url_hash, url_pattern, url_dict, properties, is_cancelled):
+    """build the form for url_hash and add it to the cache without mounting it
+    returns the form or None if there was nothing to prefetch
+    """
+    template = get_open_form()
+    if type(template) not in _templates:
+        return
+    found = find_template(url_pattern)
+    if found is None or found[0].form is not type(template):
+        msg = "prefetch %r skipped, it would redirect or change template"
+        logger.debug(msg, url_hash)
+        return
+    template_info, init_path = found
+    matched = match_route(template_info, init_path, url_pattern, url_dict)
+    if matched is None or not matched[0].cache_policy.cache:
+        logger.debug("prefetch %r skipped, no cacheable route", url_hash)
+        return
+    route_info, dynamic_vars = matched
+    key = (url_hash, template_info.form.__name__)
+    if key in _cache:
+        return
+    form = new_route_form(
+        route_info, dynamic_vars, url_hash, url_pattern, url_dict, properties
+    )
+    load_route_data(form, route_info)
+    form.__init__(**properties)
+    if is_cancelled() or key in _cache or get_open_form() is not template:
+        # a navigation got there first
+        logger.debug("prefetch %r discarded", url_hash)
+        return
+    logger.debug("prefetched route: %r, adding to cache", route_info.form.__name__)
+    _cache[key] = form
     return form
 
 
@@ -302,10 +806,145 @@ def load_error_or_raise(msg):
         raise LookupError(msg)
 
 
-def path_matcher(template_info, init_path, url_hash, url_pattern, url_dict):
+def routes_changed():
+    global _url_formatters, _route_groups
+    if _matchers is not None:
+        _matchers.clear()  # rebuilt lazily on the next lookup
+    _url_formatters = _route_groups = None
+    _resolved_routes.clear()
+
+
+def get_url_formatters(form_path):
+    global _url_formatters, _route_groups
+    if _url_formatters is None:
+        _url_formatters, _route_groups = {}, {}
+        seen = set()
+        for route_infos in _routes.values():
+            for route_info in route_infos:
+                if id(route_info) in seen:
+                    continue
+                seen.add(id(route_info))
+                path = _manifest.get_path(route_info.form)
+                formatter = UrlFormatter(route_info)
+                _url_formatters.setdefault(path, []).append(formatter)
+                # routes can only share urls if they have as many parts and the same keys
+                key = (len(route_info.url_parts), route_info.url_keys)
+                first_part, is_dynamic = route_info.url_parts[0]
+                group = _route_groups.setdefault(key, {})
+                first_part = None if is_dynamic else first_part
+                group.setdefault(first_part, []).append(route_info)
+    return _url_formatters.get(form_path, [])
+
+
+def _could_match_same_url(route_info, other):
+    if not (
+        None in route_info.template
+        or None in other.template
+        or route_info.template & other.template
+    ):
+        return False  # never checked for the same template
+    for (part, is_dynamic), (other_part, other_dynamic) in zip(
+        route_info.url_parts, other.url_parts
+    ):
+        if not (is_dynamic or other_dynamic or part == other_part):
+            return False
+    return True
+
+
+def is_unambiguous(formatter):
+    """whether no other route could match the urls this route builds"""
+    if formatter.unambiguous is None:
+        route_info = formatter.route_info
+        group = _route_groups[(len(route_info.url_parts), route_info.url_keys)]
+        first_part, is_dynamic = route_info.url_parts[0]
+        if is_dynamic:
+            others = chain.from_iterable(group.values())
+        else:
+            others = chain(group.get(first_part, ()), group.get(None, ()))
+        formatter.unambiguous = not any(
+            other is not route_info and _could_match_same_url(route_info, other)
+            for other in others
+        )
+    return formatter.unambiguous
+
+
+def url_for(form_path, values):
+    """returns the url_hash for the first route of the form that fits the values"""
+    formatters = get_url_formatters(form_path)
+    for formatter in formatters:
+        formatted = formatter.format(values)
+        if formatted is None:
+            continue
+        url_hash, url_pattern, url_dict, dynamic_vars = formatted
+        # the next navigation to this url_hash needs neither the parser nor the matcher
+        _parse_cache.set(url_hash, url_pattern, url_dict)
+        if is_unambiguous(formatter):
+            _resolved_routes.pop(url_hash, None)
+            _resolved_routes[url_hash] = (formatter.route_info, dynamic_vars)
+            if len(_resolved_routes) > MAX_RESOLVED_ROUTES:
+                del _resolved_routes[next(iter(_resolved_routes))]
+        return url_hash
+    if not formatters:
+        raise LookupError(f"no routes are registered for {form_path!r}")
+    fits = [sorted(formatter.names) for formatter in formatters]
+    msg = f"no route for {form_path!r} takes {sorted(values)} - the routes take {fits}"
+    raise LookupError(msg)
+
+
+def get_resolved_route(template_info, init_path, url_hash):
+    """the route that url_for resolved for url_hash - None if it must be matched"""
+    resolved = _resolved_routes.get(url_hash)
+    if resolved is None:
+        return None
+    route_info, dynamic_vars = resolved
+    template = route_info.template
+    if None not in template and template_info.form.__name__ not in template:
+        return None
+    if type(route_info.form) is _manifest.LazyForm:
+        return None  # the matcher imports the form
+    if not route_info.url_pattern.startswith(init_path):
+        route_info = route_info._replace(url_pattern=init_path + route_info.url_pattern)
+    return route_info, dict(dynamic_vars)
+
+
+def use_compiled_matcher(enabled=True, prefer_static=False):
+    global _matchers, _prefer_static
+    _matchers = {} if enabled else None
+    _prefer_static = prefer_static
+
+
+def get_matcher(template_name):
+    matcher = _matchers.get(template_name)
+    if matcher is None:
+        valid_routes = _routes.get(template_name, []) + _routes.get(None, [])
+        matcher = _matchers[template_name] = RouteTrie(valid_routes, _prefer_static)
+    return matcher
+
+
+def match_route(template_info, init_path, url_pattern, url_dict):
+    """returns (route_info, dynamic_vars) or None if no route matches"""
+    matched = _match_route(template_info, init_path, url_pattern, url_dict)
+    if matched is not None and type(matched[0].form) is _manifest.LazyForm:
+        resolve_lazy_form(matched[0].form)
+        return match_route(template_info, init_path, url_pattern, url_dict)
+    return matched
+
+
+def _match_route(template_info, init_path, url_pattern, url_dict):
     given_parts = url_pattern.split("/")
     num_given_parts = len(given_parts)
 
+    if _matchers is not None:
+        matched = get_matcher(template_info.form.__name__).match(given_parts, url_dict)
+        if matched is None:
+            return None
+        route_info, dynamic_vars = matched
+        if not route_info.url_pattern.startswith(init_path):
+            route_info = route_info._replace(
+                url_pattern=init_path + route_info.url_pattern
+            )
+        return route_info, dynamic_vars
+
     valid_routes = _routes.get(template_info.form.__name__, []) + _routes.get(None, [])
 
     for route_info in valid_routes:
@@ -327,6 +966,12 @@ def path_matcher(template_info, init_path, url_hash, url_pattern, url_dict):
             if set(url_dict) == route_info.url_keys:
                 return route_info, dynamic_vars
 
+
+def path_matcher(template_info, init_path, url_hash, url_pattern, url_dict):
+    matched = match_route(template_info, init_path, url_pattern, url_dict)
+    if matched is not None:
+        return matched
+
     logger.debug(
         f"no route form with: url_pattern={url_pattern!r} url_keys={list(url_dict.keys())}"
         f"template={template_info.form.__name__!r}\n"
@@ -335,47 +980,157 @@ def path_matcher(template_info, init_path, url_hash, url_pattern, url_dict):
     load_error_or_raise(f"{url_hash!r} does not exist")
 
 
-def update_form_attrs(form):
-    url_hash, url_pattern, url_dict = get_url_components()
+def update_form_attrs(form, url_hash=None, url_pattern=None, url_dict=None):
+    if url_hash is None:
+        url_hash, url_pattern, url_dict = get_url_components()
     # reapply these before the show event
     form.url_hash = url_hash
     form.url_pattern = url_pattern
     form.url_dict = url_dict
     title = getattr(form, "_routing_props", {}).get("title")
     if title is None:
-        document.title = default_title
+        set_title(default_title)
         return
     try:
-        document.title = title.format(**url_dict, **getattr(form, "dynamic_vars", {}))
+        title = render_title(title, url_dict, getattr(form, "dynamic_vars", {}))
     except Exception:
         msg = f"error generating the page title - check the title argument in {type(form).__name__!r} template decorator."
         raise ValueError(msg)
+    set_title(title)
+
+
+def set_title(title):
+    document = window.document
+    # a read is cheaper than a write - and app code may have set the title itself
+    if document.title != title:
+        document.title = title
 
 
 def add_form_to_container(form):
+    if _keep_alive:
+        return show_kept_alive_form(form, get_open_form().content_panel)
     if form.parent:
         # I may have been used within another template so remove me from my parent
         form.remove_from_parent()
     layout_props = getattr(form, "_routing_props", {}).get("layout_props", {})
     cp = get_open_form().content_panel
     cp.clear()  # clear it again
+    form.visible = True  # in case it was hidden in keep alive mode
     cp.add_component(form, **layout_props)
 
 
+def set_history_window(positions):
+    global _history_window
+    _history_window = positions
+    if positions is not None:
+        trim_to_history_window()
+
+
+def set_canonical_urls(enabled):
+    if _utils.canonical_urls == enabled:
+        return
+    _utils.canonical_urls = enabled
+    if _cache:
+        # the cached keys are in the old form
+        logger.debug("clearing the cache, canonical urls changed")
+        _cache.remove_all()
+
+
+def get_reachable_hashes():
+    """the url_hashes within the history window - None if there is no history window"""
+    if _history_window is None:
+        return None
+    from . import _navigation
+
+    return _navigation.hashes_near(_navigation.current["pos"], _history_window)
+
+
+def trim_to_history_window():
+    from . import _navigation
+
+    _cache.evict_unreachable(get_reachable_hashes(), _navigation.seen_hashes)
+
+
+def is_cached(form):
+    return any(f is form for f in dict.values(_cache))
+
+
+def set_keep_alive(max_mounted):
+    global _keep_alive
+    _keep_alive = max_mounted
+    trim_kept_alive_forms()
+
+
+def unmount(form):
+    form.remove_from_parent()
+    form.visible = True  # in case it is added to a content_panel outside keep alive mode
+
+
+def trim_kept_alive_forms():
+    # the visible form is last so it is never trimmed
+    while len(_mounted) > max(_keep_alive, 1):
+        unmount(_mounted.pop(0))
+    if not _keep_alive:
+        for form in _mounted:
+            form.visible = True  # stays mounted as the current form
+        _mounted.clear()
+
+
+def unmount_kept_alive_form(form):
+    """called when a form is evicted from the cache"""
+    if form in _mounted and _mounted[-1] is not form:
+        _mounted.remove(form)
+        unmount(form)
+
+
+def show_kept_alive_form(form, cp):
+    global _mounted_panel
+    if cp is not _mounted_panel:
+        # a new template - unmount the forms in the old content_panel
+        while _mounted:
+            unmount(_mounted.pop())
+        cp.clear()
+        _mounted_panel = cp
+    if _mounted and _mounted[-1] is form and form.parent is cp:
+        if not form.visible:
+            form.visible = True
+        return  # already showing
+    if _mounted:
+        previous = _mounted[-1]
+        if previous.parent is cp and is_cached(previous):
+            previous.visible = False
+        else:
+            _mounted.pop()
+            unmount(previous)
+    if form in _mounted:
+        _mounted.remove(form)
+    if form.parent is not cp:
+        if form.parent:
+            # I may have been used within another template so remove me from my parent
+            form.remove_from_parent()
+        layout_props = getattr(form, "_routing_props", {}).get("layout_props", {})
+        cp.add_component(form, **layout_props)
+    form.visible = True
+    _mounted.append(form)
+    trim_kept_alive_forms()
+
+
 def alert_form_loaded(**url_args):
     f = get_open_form()
     on_form_load = getattr(f, "on_form_load", None)
     if on_form_load is not None:
-        logger.debug(f"{f.__class__.__name__}.on_form_load() called")
+        logger.debug("%s.on_form_load() called", type(f).__name__)
         on_form_load(**url_args)
 
 
 def load_error_form():
     global _error_form, _current_form
-    logger.debug(f"loading error form: {_error_form!r}")
+    logger.debug("loading error form: %r", _error_form)
     url_hash, _, _ = get_url_components()
-    _cache[url_hash] = _error_form()
-    _current_form = _cache[url_hash]
+    _current_form = _error_form()
+    # with canonical urls other url_hashes may share the key - only cache the exact one
+    if _utils._cache_url_hash(url_hash) == url_hash:
+        _cache[url_hash] = _current_form
     f = get_open_form()
     if f is not None:
         add_form_to_container(_current_form)
@@ -384,22 +1139,132 @@ def load_error_form():
 
 
 def add_route_info(route_info):
-    msg = "   route registered: (form={form.__name__!r}, url_pattern={url_pattern!r}, url_keys={url_keys}, title={title!r}, template={template!r})"
-    logger.debug(msg.format(**route_info._asdict()))
+    if _lazy_routes and bind_lazy_route(route_info):
+        return
+    if logger.is_enabled_for(DEBUG):
+        msg = "   route registered: (form={form.__name__!r}, url_pattern={url_pattern!r}, url_keys={url_keys}, title={title!r}, template={template!r})"
+        logger.debug(msg.format(**route_info._asdict()))
+        if _manifest_loaded:
+            msg = "route manifest is out of date, route %r for %r is missing"
+            logger.warning(msg, route_info.url_pattern, route_info.form.__name__)
+    positions = []
     for template in route_info.template:
-        _routes.setdefault(template, []).append(route_info)
+        route_infos = _routes.setdefault(template, [])
+        positions.append((template, len(route_infos)))
+        route_infos.append(route_info)
+    if type(route_info.form) is _manifest.LazyForm:
+        # registered by path - the form is imported when the route is first matched
+        pending = _lazy_routes.setdefault(route_info.form.path, [])
+        pending.append((route_info, positions))
+    routes_changed()
 
 
 def add_info(info_type, callable_, priority, info):
-    global _ordered_info, _templates
-    msg = f"{info_type} registered: {repr(info).replace(type(info).__name__, '')}"
-    logger.debug(msg)
+    global _ordered_info, _templates, _info_index
+    if logger.is_enabled_for(DEBUG):
+        msg = f"{info_type} registered: {repr(info).replace(type(info).__name__, '')}"
+        logger.debug(msg)
+        if _manifest_loaded:
+            check_manifest_info(info_type, info, priority)
     if info_type == "template":
         _templates.add(callable_)
+    _info_index = None
+    if priority in _ordered_info:
+        _ordered_info[priority].append(info)
+        return
+    # only a new priority changes the order
     tmp = _ordered_info
-    tmp.setdefault(priority, []).append(info)
+    tmp[priority] = [info]
     ordered = {}
     for priority in sorted(tmp, reverse=True):
         # rely on insertion order
         ordered[priority] = tmp[priority]
     _ordered_info = ordered
+
+
+def load_manifest(manifest):
+    """register every route in the manifest in one step
+    each form is imported when one of its routes is first matched
+    """
+    global _routes, _manifest_loaded
+    if any(_routes.values()):
+        msg = "the route manifest must be loaded before any routes are registered"
+        raise RuntimeError(msg)
+    _routes = _manifest.load(manifest)
+    _manifest_loaded = True
+    index_lazy_routes()
+    _manifest_infos.clear()
+    for entry in manifest.get("info", ()):
+        key = (entry["type"], entry["callable"], tuple(entry["path"]))
+        _manifest_infos[key] = entry["priority"]
+    routes_changed()
+    num_routes = sum(len(route_infos) for route_infos in _lazy_routes.values())
+    logger.debug("loaded %r routes from the route manifest", num_routes)
+
+
+def index_lazy_routes():
+    """map each route whose form is not imported to its positions in _routes"""
+    _lazy_routes.clear()
+    seen = {}
+    for template, route_infos in _routes.items():
+        for i, route_info in enumerate(route_infos):
+            if type(route_info.form) is not _manifest.LazyForm:
+                continue
+            positions = seen.get(id(route_info))
+            if positions is None:
+                positions = seen[id(route_info)] = []
+                pending = _lazy_routes.setdefault(route_info.form.path, [])
+                pending.append((route_info, positions))
+            positions.append((template, i))
+
+
+def check_manifest_info(info_type, info, priority):
+    key = (info_type, _manifest.get_path(info[0]), tuple(sorted(info.path)))
+    if _manifest_infos.get(key) != priority:
+        msg = "route manifest is out of date, %s %r is missing or has another priority"
+        logger.warning(msg, info_type, info[0].__name__)
+
+
+def bind_lazy_route(route_info):
+    """swap a route registered by path (or from the manifest) for the same route
+    registered by its decorator - returns False if there is no such route to swap
+    """
+    pending = _lazy_routes.get(_manifest.get_path(route_info.form))
+    if not pending:
+        return False
+    for i, (lazy_info, _) in enumerate(pending):
+        if lazy_info.url_pattern == route_info.url_pattern:
+            break
+    else:
+        i = 0  # a stale manifest - the decorator changed the url_pattern
+    lazy_info, positions = pending.pop(i)
+    if logger.is_enabled_for(DEBUG):
+        differ = _manifest.diff_route(lazy_info, route_info)
+        if differ:
+            msg = "route for %r does not match its decorator, these fields differ: %s"
+            logger.warning(msg, route_info.form.__name__, ", ".join(differ))
+    routes_changed()
+    if lazy_info.template != route_info.template:
+        # drop the lazy route and register the decorator route
+        for template, _ in positions:
+            route_infos = _routes[template]
+            _routes[template] = [r for r in route_infos if r is not lazy_info]
+        index_lazy_routes()
+        return False
+    for template, i in positions:
+        _routes[template][i] = route_info
+    if type(route_info.form) is _manifest.LazyForm:
+        pending.append((route_info, positions))  # registered by path, not yet imported
+    return True
+
+
+def resolve_lazy_form(lazy_form):
+    """import the form for a lazy route - importing it runs any route decorators"""
+    logger.debug("importing route form: %r", lazy_form.path)
+    cls = lazy_form.resolve()
+    for lazy_info, positions in _lazy_routes.pop(lazy_form.path, ()):
+        # no decorator claimed this route, use the lazy route with the imported form
+        route_info = lazy_info._replace(form=cls)
+        for template, i in positions:
+            _routes[template][i] = route_info
+    routes_changed()
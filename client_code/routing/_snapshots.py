@@ -0,0 +1,153 @@
+# SPDX-License-Identifier: MIT
+#
+# Copyright (c) 2021 The Anvil Extras project team members listed at
+# https://github.com/anvilistas/anvil-extras/graphs/contributors
+#
+# This software is published at https://github.com/anvilistas/anvil-extras
+
+import json
+from time import time as _time
+
+from anvil.js.window import window
+
+from ._logging import logger
+
+__version__ = "2.1.0"
+
+STORAGE_KEY = "HashRouting.snapshots"
+
+enabled = False
+storage = None  # anything with getItem/setItem/removeItem - None is window.sessionStorage
+max_entries = 20
+max_size = 100000  # characters of json kept in storage
+ttl = 3600  # seconds
+version = None  # snapshots saved with another version are discarded
+
+_snapshots = None  # url_hash -> entry, oldest first - read from storage on first use
+_listening = False
+
+
+class MemoryStorage:
+    """an in-memory stand-in for sessionStorage e.g. for tests"""
+
+    def __init__(self):
+        self._items = {}
+
+    def getItem(self, key):
+        return self._items.get(key)
+
+    def setItem(self, key, value):
+        self._items[key] = str(value)
+
+    def removeItem(self, key):
+        self._items.pop(key, None)
+
+
+def _get_storage():
+    return window.sessionStorage if storage is None else storage
+
+
+def _form_path(form):
+    cls = type(form)
+    return f"{cls.__module__}.{cls.__name__}"
+
+
+def _load():
+    global _snapshots
+    if _snapshots is None:
+        try:
+            data = _get_storage().getItem(STORAGE_KEY)
+            _snapshots = json.loads(data) if data else {}
+        except Exception as e:
+            logger.debug("could not read route snapshots: %r", e)
+            _snapshots = {}
+    return _snapshots
+
+
+def _save():
+    snapshots = _load()
+    data = json.dumps(snapshots)
+    while snapshots and (len(snapshots) > max_entries or len(data) > max_size):
+        del snapshots[next(iter(snapshots))]  # the oldest
+        data = json.dumps(snapshots)
+    try:
+        _get_storage().setItem(STORAGE_KEY, data)
+    except Exception as e:
+        # e.g. the storage quota is exceeded - snapshots are best effort
+        logger.debug("could not write route snapshots: %r", e)
+
+
+def reset():
+    """forget what was read from storage e.g. the storage was changed"""
+    global _snapshots
+    _snapshots = None
+
+
+def listen():
+    """save the current form when the page is hidden e.g. before a reload"""
+    global _listening
+    if _listening:
+        return
+    _listening = True
+
+    def on_pagehide(e):
+        from . import _router
+
+        if enabled and _router._current_form is not None:
+            save(_router._current_form)
+
+    window.addEventListener("pagehide", on_pagehide)
+
+
+def save(form):
+    """store the form's get_snapshot() result against its url_hash"""
+    get_snapshot = getattr(form, "get_snapshot", None)
+    url_hash = getattr(form, "url_hash", None)
+    if get_snapshot is None or url_hash is None:
+        return
+    try:
+        state = get_snapshot()
+        state = None if state is None else json.dumps(state)
+    except Exception as e:
+        logger.debug("could not snapshot %r: %r", type(form).__name__, e)
+        return
+    snapshots = _load()
+    snapshots.pop(url_hash, None)  # the most recent is last
+    if state is not None:
+        logger.debug("saving snapshot for %r", url_hash)
+        snapshots[url_hash] = {
+            "form": _form_path(form),
+            "version": [version, getattr(form, "snapshot_version", None)],
+            "time": _time(),
+            "state": state,
+        }
+    _save()
+
+
+def take(url_hash, form):
+    """the form's snapshot for url_hash or None - a snapshot is only used once"""
+    snapshots = _load()
+    entry = snapshots.pop(url_hash, None)
+    if entry is None:
+        return None
+    _save()
+    if entry.get("form") != _form_path(form):
+        reason = "another form's"
+    elif entry.get("version") != [version, getattr(form, "snapshot_version", None)]:
+        reason = "an old version"
+    elif ttl is not None and _time() - entry.get("time", 0) > ttl:
+        reason = "an expired"
+    else:
+        logger.debug("restoring snapshot for %r", url_hash)
+        return json.loads(entry["state"])
+    logger.debug("discarding %s snapshot for %r", reason, url_hash)
+    return None
+
+
+def clear():
+    global _snapshots
+    _snapshots = {}
+    try:
+        _get_storage().removeItem(STORAGE_KEY)
+    except Exception as e:
+        logger.debug("could not clear route snapshots: %r", e)
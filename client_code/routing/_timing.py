@@ -0,0 +1,132 @@
+# SPDX-License-Identifier: MIT
+#
+# Copyright (c) 2021 The Anvil Extras project team members listed at
+# https://github.com/anvilistas/anvil-extras/graphs/contributors
+#
+# This software is published at https://github.com/anvilistas/anvil-extras
+
+from time import time as _time
+
+from ._logging import logger
+
+__version__ = "2.1.0"
+
+_subscribers = []
+_history = []
+_max_history = 50
+
+
+class _Phase:
+    def __init__(self, timing, name):
+        self.timing = timing
+        self.name = name
+
+    def __enter__(self):
+        self.start = _time()
+        return self
+
+    def __exit__(self, exc_type, *args):
+        phases = self.timing.phases
+        phases[self.name] = phases.get(self.name, 0) + _time() - self.start
+        if exc_type is not None and self.timing.exit_phase is None:
+            self.timing.exit_phase = self.name
+
+
+class NavigationTiming:
+    def __init__(self, url_hash):
+        self.url_hash = url_hash
+        self.start = _time()
+        self.phases = {}  # phase name -> seconds in the order they ran
+        self.calls = []  # conditions, redirects and templates called while resolving
+        self.exit_phase = None  # the phase that was running if we exited early
+        self.exit_reason = None
+        self.total = None
+
+    def phase(self, name):
+        return _Phase(self, name)
+
+    def call(self, kind, name, fn):
+        start = _time()
+        try:
+            return fn()
+        finally:
+            duration = _time() - start
+            call = {"kind": kind, "name": name, "duration": duration, "cached": False}
+            self.calls.append(call)
+
+    def cached(self, kind, name):
+        """a call whose result was reused rather than computed"""
+        self.calls.append({"kind": kind, "name": name, "duration": 0, "cached": True})
+
+    def finish(self, exc_type):
+        self.total = _time() - self.start
+        if exc_type is not None:
+            self.exit_reason = exc_type.__name__
+        record = self.as_dict()
+        _history.append(record)
+        if len(_history) > _max_history:
+            del _history[: len(_history) - _max_history]
+        for subscriber in list(_subscribers):
+            try:
+                subscriber(record)
+            except Exception as e:
+                # telemetry must not break a navigation or hide its NavigationExit
+                logger.error("navigation timing subscriber %r raised %r", subscriber, e)
+
+    def as_dict(self):
+        return {
+            "url_hash": self.url_hash,
+            "completed": self.exit_reason is None,
+            "exit_reason": self.exit_reason,
+            "exit_phase": self.exit_phase,
+            "total": self.total,
+            "phases": dict(self.phases),
+            "calls": list(self.calls),
+        }
+
+
+class _NullPhase:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+class _NullTiming:
+    """used when there is no active navigation e.g. loading the error form"""
+
+    def phase(self, name):
+        return _NullPhase()
+
+    def call(self, kind, name, fn):
+        return fn()
+
+    def cached(self, kind, name):
+        pass
+
+
+null_timing = _NullTiming()
+
+
+def add_subscriber(callback):
+    _subscribers.append(callback)
+
+
+def remove_subscriber(callback):
+    _subscribers.remove(callback)
+
+
+def get_history():
+    return list(_history)
+
+
+def clear_history():
+    _history.clear()
+
+
+def set_max_history(max_history):
+    global _max_history
+    _max_history = max_history
+    if len(_history) > max_history:
+        del _history[: len(_history) - max_history]
@@ -6,61 +6,120 @@
 # This software is published at https://github.com/anvilistas/anvil-extras
 
 from collections import namedtuple
+from string import Formatter
 
 import anvil
-from anvil.js.window import location
+from anvil.js.window import window
 
 from ._logging import logger
 
 __version__ = "2.1.0"
 
 
+class _ParseCache:
+    """a bounded cache of parsed url_hash strings - oldest entries are dropped first"""
+
+    def __init__(self, max_size=128):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._parsed = {}
+
+    def get(self, url_hash):
+        parsed = self._parsed.get(url_hash)
+        if parsed is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        url_pattern, url_dict = parsed
+        # hand out a copy so callers are free to mutate their url_dict
+        return url_hash, url_pattern, dict(url_dict)
+
+    def set(self, url_hash, url_pattern, url_dict):
+        if not self.max_size:
+            return
+        parsed = self._parsed
+        if len(parsed) >= self.max_size:
+            del parsed[next(iter(parsed))]
+        parsed[url_hash] = (url_pattern, dict(url_dict))
+
+    def set_max_size(self, max_size):
+        self.max_size = max_size
+        parsed = self._parsed
+        while len(parsed) > max_size:
+            del parsed[next(iter(parsed))]
+
+    def clear(self):
+        self._parsed.clear()
+        self.hits = self.misses = 0
+
+    def info(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._parsed),
+            "max_size": self.max_size,
+        }
+
+
+_parse_cache = _ParseCache()
+
+
 def get_url_components(url_hash=None):
     """returns  url_hash, url_pattern, url_dict
     this will get the components from the current addressbar url_hash unless you provide a url_hash to decode
     """
     if url_hash is None:
         # url_hash = anvil.get_url_hash()  #changed since anvil decodes the url_hash
-        url_hash = location.hash[1:]  # without the hash
+        url_hash = window.location.hash[1:]  # without the hash
     elif isinstance(url_hash, str):
         url_hash = url_hash if not url_hash.startswith("#") else url_hash[1:]
 
-    if isinstance(url_hash, dict):
-        # this is the case when anvil converts the url hash to a dict automatically
-        url_pattern = ""
-        url_dict = {
-            k: (anvil.http.url_decode(v) if v != "undefined" else "")
-            for k, v in url_hash.items()
-        }  # anvil.get_url_hash return 'undefined' for empty parameters
-        url_hash = "?" + "&".join(
-            f"{key}={anvil.http.url_encode(value)}" for key, value in url_dict.items()
-        )
-    elif "?" not in url_hash:  # then we have no parameters as part of the url
-        url_pattern = url_hash
-        url_dict = {}
-    else:
-        url_pattern, url_dict = url_hash.split("?", 1)
-        key_value_pairs = url_dict.split("&")
-        for i, pair in enumerate(key_value_pairs):
-            if "=" not in pair:
-                logger.debug(
-                    f"\n\n**WARNING**:\ngot an unusual url parameter with no '=': {pair!r}"
-                    f"\nIf this parameter split unexpectedly it probably contains '&'. Use:"
-                    f"\nrouting.set_url_hash(url_pattern=url_pattern, url_dict=url_dict)"
-                    f"\nFor correct encoding\n"
-                )
-                key_value_pairs[i] = pair = pair + "="
-            key, value = pair.split("=", 1)
-            key_value_pairs[i] = f"{key}={anvil.http.url_decode(value)}"
-        url_dict = dict(pair.split("=", 1) for pair in key_value_pairs)
+    if isinstance(url_hash, str):
+        cached = _parse_cache.get(url_hash)
+        if cached is not None:
+            return cached
+        url_hash, url_pattern, url_dict = _parse_url_hash(url_hash)
+        _parse_cache.set(url_hash, url_pattern, url_dict)
+        return url_hash, url_pattern, url_dict
+
+    # this is the case when anvil converts the url hash to a dict automatically
+    url_pattern = ""
+    url_dict = {
+        k: (anvil.http.url_decode(v) if v != "undefined" else "")
+        for k, v in url_hash.items()
+    }  # anvil.get_url_hash return 'undefined' for empty parameters
+    url_hash = "?" + "&".join(
+        f"{key}={anvil.http.url_encode(value)}" for key, value in url_dict.items()
+    )
+    return url_hash, url_pattern, url_dict
+
 
+def _parse_url_hash(url_hash):
+    if "?" not in url_hash:  # then we have no parameters as part of the url
+        return url_hash, url_hash, {}
+
+    url_pattern, url_dict = url_hash.split("?", 1)
+    key_value_pairs = url_dict.split("&")
+    for i, pair in enumerate(key_value_pairs):
+        if "=" not in pair:
+            logger.debug(
+                f"\n\n**WARNING**:\ngot an unusual url parameter with no '=': {pair!r}"
+                f"\nIf this parameter split unexpectedly it probably contains '&'. Use:"
+                f"\nrouting.set_url_hash(url_pattern=url_pattern, url_dict=url_dict)"
+                f"\nFor correct encoding\n"
+            )
+            key_value_pairs[i] = pair = pair + "="
+        key, value = pair.split("=", 1)
+        key_value_pairs[i] = f"{key}={anvil.http.url_decode(value)}"
+    url_dict = dict(pair.split("=", 1) for pair in key_value_pairs)
     return url_hash, url_pattern, url_dict
 
 
 def get_url_hash(url_hash=None) -> str:
     """returns the current url_hash"""
     if url_hash is None:
-        return location.hash[1:]
+        return window.location.hash[1:]
     return get_url_components(url_hash=url_hash)[0]
 
 
@@ -93,6 +152,38 @@ def _process_url_arguments(url_hash=None, *, url_pattern=None, url_dict=None):
     return url_hash, url_pattern, url_dict
 
 
+canonical_urls = False  # see routing.set_canonical_urls
+_canonical_hashes = {}  # url_hash -> canonical url_hash - bounded like the parse cache
+MAX_CANONICAL_HASHES = 256
+
+
+def canonical_url_hash(url_hash):
+    """one url_hash for url_hashes that route the same - query keys sorted, values encoded once
+    e.g. "item?b=2&a=1" and "item?a=1&b=%32" are both "item?a=1&b=2"
+    the url_pattern and query keys are kept as given since the route matcher compares them as is
+    """
+    canonical = _canonical_hashes.get(url_hash)
+    if canonical is not None:
+        return canonical
+    url_encode = anvil.http.url_encode
+    _, url_pattern, url_dict = get_url_components(url_hash)
+    canonical = url_pattern
+    if "?" in url_hash:
+        # url_dict values are decoded so re-encoding them gives one encoding
+        canonical += "?" + "&".join(
+            f"{key}={url_encode(value)}" for key, value in sorted(url_dict.items())
+        )
+    if len(_canonical_hashes) >= MAX_CANONICAL_HASHES:
+        del _canonical_hashes[next(iter(_canonical_hashes))]
+    _canonical_hashes[url_hash] = canonical
+    return canonical
+
+
+def _cache_url_hash(url_hash):
+    """the url_hash forms are cached against - the address bar always keeps the url_hash as given"""
+    return canonical_url_hash(url_hash) if canonical_urls else url_hash
+
+
 def _get_url_hash(url_pattern, url_dict):
     url_params = "&".join(
         f"{key}={anvil.http.url_encode(str(value))}" for key, value in url_dict.items()
@@ -101,6 +192,41 @@ def _get_url_hash(url_pattern, url_dict):
     return url_pattern + url_params
 
 
+class UrlFormatter:
+    """builds the url for a route from its dynamic segments and url_keys - the reverse of matching"""
+
+    def __init__(self, route_info):
+        self.route_info = route_info
+        self.url_parts = route_info.url_parts
+        self.url_keys = route_info.url_keys
+        dynamic_parts = [part for part, is_dynamic in self.url_parts if is_dynamic]
+        self.names = self.url_keys.union(dynamic_parts)
+        self.unambiguous = None  # no other route matches these urls - set by the router
+
+    def format(self, values):
+        """returns url_hash, url_pattern, url_dict, dynamic_vars
+        or None if the values are not exactly this route's dynamic segments and url_keys
+        """
+        if len(values) != len(self.names) or not self.names.issuperset(values):
+            return None
+        dynamic_vars = {}
+        parts = []
+        for part, is_dynamic in self.url_parts:
+            if is_dynamic:
+                value = str(values[part])
+                if "/" in value or "?" in value:
+                    msg = f"{part}={value!r} cannot be used in a url_pattern segment"
+                    raise ValueError(msg)
+                dynamic_vars[part] = value
+                part = value
+            parts.append(part)
+        url_pattern = "/".join(parts)
+        url_keys = self.url_keys
+        url_dict = {key: str(value) for key, value in values.items() if key in url_keys}
+        url_hash = _get_url_hash(url_pattern, url_dict)
+        return url_hash, url_pattern, url_dict, dynamic_vars
+
+
 def _as_frozen_str_iterable(obj, attr, allow_none=False, factory=frozenset):
     if isinstance(obj, str) or (allow_none and obj is None):
         return factory([obj])
@@ -113,13 +239,83 @@ def _as_frozen_str_iterable(obj, attr, allow_none=False, factory=frozenset):
     return factory(rv)
 
 
+_formatter = Formatter()
+_conversions = {"r": repr, "s": str, "a": ascii}
+
+
+def parse_title(title):
+    """the compiled title - a str for a static title
+    otherwise a tuple of (literal_text, field_name, format_spec, conversion) as from str.format
+    """
+    try:
+        parsed = tuple(_formatter.parse(title))
+    except ValueError as e:
+        raise ValueError(f"invalid title {title!r}: {e}") from None
+    if all(field is None for _, field, _, _ in parsed):
+        return "".join(literal for literal, _, _, _ in parsed)  # "{{" is now "{"
+    return parsed
+
+
+def compile_title(title, url_keys, url_parts):
+    """parse a route title once at registration
+    its placeholders must be url_keys or dynamic url_pattern segments
+    """
+    compiled = parse_title(title)
+    if type(compiled) is str:
+        return compiled
+    names = set(url_keys).union(part for part, is_dynamic in url_parts if is_dynamic)
+    unknown = []
+    for _, field, format_spec, _ in compiled:
+        if field is None:
+            continue
+        if "{" in format_spec:
+            raise ValueError(f"title {title!r} uses a nested format spec")
+        if field not in names:
+            unknown.append(field)  # includes "{}", "{0}" and "{id.attr}"
+    if unknown:
+        msg = f"title {title!r} uses {unknown} which are not url_keys or dynamic url_pattern segments"
+        raise ValueError(msg)
+    return compiled
+
+
+def render_title(compiled, url_dict, dynamic_vars):
+    if type(compiled) is str:
+        return compiled
+    parts = []
+    for literal, field, format_spec, conversion in compiled:
+        parts.append(literal)
+        if field is None:
+            continue
+        value = dynamic_vars[field] if field in dynamic_vars else url_dict[field]
+        if conversion:
+            value = _conversions[conversion](value)
+        parts.append(format(value, format_spec))
+    return "".join(parts)
+
+
 _RouteInfoBase = namedtuple(
     "route_info",
-    ["form", "template", "url_pattern", "url_keys", "title", "fwr", "url_parts"],
+    [
+        "form",
+        "template",
+        "url_pattern",
+        "url_keys",
+        "title",
+        "fwr",
+        "url_parts",
+        "cache_policy",
+        "placeholder",
+        "loader",
+        "compiled_title",
+    ],
 )
 
 TemplateInfo = namedtuple("template_info", ["form", "path", "condition"])
 RedirectInfo = namedtuple("redirect_info", ["redirect", "path", "condition"])
+CachePolicy = namedtuple("cache_policy", ["cache", "max_instances", "ttl"])
+DataLoader = namedtuple("data_loader", ["load", "ttl"])
+
+DEFAULT_CACHE_POLICY = CachePolicy(cache=True, max_instances=None, ttl=None)
 
 
 class RouteInfo(_RouteInfoBase):
@@ -129,12 +325,38 @@ class RouteInfo(_RouteInfoBase):
             return part[1:-1], True
         return part, False
 
-    def __new__(cls, form, template, url_pattern, url_keys, title, fwr, url_parts=()):
+    def __new__(
+        cls,
+        form,
+        template,
+        url_pattern,
+        url_keys,
+        title,
+        fwr,
+        url_parts=(),
+        cache_policy=DEFAULT_CACHE_POLICY,
+        placeholder=None,
+        loader=None,
+        compiled_title=None,
+    ):
         if url_pattern.endswith("/"):
             url_pattern = url_pattern[:-1]
 
         url_parts = tuple(cls.as_dynamic_var(part) for part in url_pattern.split("/"))
+        if title is not None:
+            compiled_title = compile_title(title, url_keys, url_parts)
 
         return _RouteInfoBase.__new__(
-            cls, form, template, url_pattern, url_keys, title, fwr, url_parts
+            cls,
+            form,
+            template,
+            url_pattern,
+            url_keys,
+            title,
+            fwr,
+            url_parts,
+            cache_policy,
+            placeholder,
+            loader,
+            compiled_title,
         )